@@ -30,6 +30,8 @@ DEFAULT_SAMPLE_COUNT = 5
 
 # Store active SSE sessions
 SSE_SESSIONS: Dict[str, Any] = {}
+# Keepalive comment frame, pre-encoded
+PING_BYTES = b": ping\n\n"
 
 # Initialize analyzer
 analyzer = BasinAnalyzer(
@@ -361,7 +363,7 @@ async def handle_sse_get(request):
         while True:
             await asyncio.sleep(30)
             try:
-                await response.write(f": ping\n\n".encode())
+                await response.write(PING_BYTES)
             except:
                 break
 
@@ -37,6 +37,8 @@ AUTH_TOKEN = os.environ.get("MCP_AUTH_TOKEN", "")
 
 # Store active SSE sessions
 SSE_SESSIONS: Dict[str, Any] = {}
+# Keepalive comment frame, pre-encoded
+PING_BYTES = b": ping\n\n"
 
 # Connection pool
 _pool: Optional[aiomysql.Pool] = None
@@ -549,7 +551,7 @@ async def handle_sse_get(request):
         while True:
             await asyncio.sleep(30)
             try:
-                await response.write(f": ping\n\n".encode())
+                await response.write(PING_BYTES)
             except:
                 break
 
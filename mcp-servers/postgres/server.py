@@ -36,6 +36,8 @@ AUTH_TOKEN = os.environ.get("MCP_AUTH_TOKEN", "")
 
 # Store active SSE sessions
 SSE_SESSIONS: Dict[str, Any] = {}
+# Keepalive comment frame, pre-encoded
+PING_BYTES = b": ping\n\n"
 
 
 def get_headers() -> dict:
@@ -1886,7 +1888,7 @@ async def handle_sse_get(request):
         while True:
             await asyncio.sleep(30)
             try:
-                await response.write(f": ping\n\n".encode())
+                await response.write(PING_BYTES)
             except:
                 break
 
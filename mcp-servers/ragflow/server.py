@@ -18,13 +18,36 @@ Tools:
 """
 
 import os
+import re
 import json
 import asyncio
 import uuid
-from typing import Optional, Dict, Any, List
+import hashlib
+import functools
+import inspect
+import heapq
+import time
+from collections import OrderedDict, defaultdict
+from itertools import islice
+from typing import Optional, Dict, Any, List, Set, Callable
 import httpx
+import orjson
 from aiohttp import web
 
+# Optional: xxhash for fast non-cryptographic dedup keys (falls back to md5)
+try:
+    import xxhash
+    XXHASH_AVAILABLE = True
+except ImportError:
+    XXHASH_AVAILABLE = False
+
+# Optional: h2 lets httpx speak HTTP/2 (installed via httpx[http2])
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
 # RAGFlow API configuration
 RAGFLOW_BASE_URL = os.environ.get("RAGFLOW_API_URL", "http://178.156.192.12/api/v1")
 API_TOKEN = os.environ.get("RAGFLOW_API_TOKEN", "")
@@ -37,8 +60,40 @@ ES_HOST = os.environ.get("ES_HOST", "ragflow-es")
 ES_PORT = os.environ.get("ES_PORT", "9200")
 TENANT_ID = os.environ.get("RAGFLOW_TENANT_ID", "74bea108daab11f0b3cc0242ac120006")
 
+# Shared HTTP clients: created lazily, closed on app cleanup. Reusing pooled
+# keep-alive connections avoids a TCP handshake per tool call and lets the
+# investigate() fan-out share sockets.
+HTTP_LIMITS = httpx.Limits(
+    max_connections=int(os.environ.get("HTTP_MAX_CONNECTIONS", "64")),
+    max_keepalive_connections=int(os.environ.get("HTTP_MAX_KEEPALIVE", "50")),
+    keepalive_expiry=15.0,
+)
+# Max RAGFlow requests in flight across all tool calls. Concurrent fan-outs
+# (search_all_kbs, investigate, analyze_kb_need) queue here instead of piling
+# onto RAGFlow's embedding backend; the pool wait stays short as a result.
+RAGFLOW_CONCURRENCY = int(os.environ.get("RAGFLOW_CONCURRENCY", "16"))
+RAGFLOW_SEMAPHORE = asyncio.Semaphore(RAGFLOW_CONCURRENCY)
+# Max concurrent sub-searches per fan-out (search_all_kbs, investigate)
+SEARCH_CONCURRENCY = 10
+# HTTP/2 multiplexes concurrent tool calls and fan-out searches over one
+# connection. httpx only negotiates it over TLS, so it is used for https URLs.
+RAGFLOW_HTTP2 = HTTP2_AVAILABLE and RAGFLOW_BASE_URL.startswith("https://")
+_RAGFLOW_CLIENT: Optional[httpx.AsyncClient] = None
+_ES_CLIENT: Optional[httpx.AsyncClient] = None
+# Whether RAGFlow accepts one POST /retrieval over several datasets
+# (None = not probed yet, False = fall back to one request per dataset
+# until _COMBINED_RETRY_AT, then probe again: datasets and servers change)
+_COMBINED_RETRIEVAL: Optional[bool] = None
+_COMBINED_RETRY_AT = 0.0
+COMBINED_RETRY_AFTER = 600.0
+
 # Store active SSE sessions: session_id -> response writer
-SSE_SESSIONS: Dict[str, Any] = {}
+SSE_SESSIONS: Dict[str, web.StreamResponse] = {}
+# session_id -> event set when the keepalive finds the client gone
+SSE_CLOSED: Dict[str, asyncio.Event] = {}
+# One keepalive task pings every open session on a shared interval
+SSE_PING_INTERVAL = 30
+_KEEPALIVE_TASK: Optional[asyncio.Task] = None
 
 
 def get_headers() -> dict:
@@ -49,6 +104,213 @@ def get_headers() -> dict:
     return headers
 
 
+def get_client() -> httpx.AsyncClient:
+    """Get the shared client for the RAGFlow API (paths are relative to RAGFLOW_BASE_URL)."""
+    global _RAGFLOW_CLIENT
+    if _RAGFLOW_CLIENT is None or _RAGFLOW_CLIENT.is_closed:
+        _RAGFLOW_CLIENT = httpx.AsyncClient(
+            base_url=RAGFLOW_BASE_URL, timeout=60.0, limits=HTTP_LIMITS, http2=RAGFLOW_HTTP2
+        )
+    return _RAGFLOW_CLIENT
+
+
+async def ragflow_request(method: str, path: str, **kwargs) -> httpx.Response:
+    """Send a request on the shared RAGFlow client, bounded by RAGFLOW_CONCURRENCY."""
+    async with RAGFLOW_SEMAPHORE:
+        return await get_client().request(method, path, **kwargs)
+
+
+def get_es_client() -> httpx.AsyncClient:
+    """Get the shared client for direct Elasticsearch queries."""
+    global _ES_CLIENT
+    if _ES_CLIENT is None or _ES_CLIENT.is_closed:
+        _ES_CLIENT = httpx.AsyncClient(base_url=f"http://{ES_HOST}:{ES_PORT}", timeout=60.0, limits=HTTP_LIMITS)
+    return _ES_CLIENT
+
+
+async def open_clients(app=None):
+    """Create the shared HTTP clients up front (registered as an aiohttp startup hook)."""
+    get_client()
+    get_es_client()
+
+
+async def close_clients(app=None):
+    """Close shared HTTP clients (registered as an aiohttp cleanup hook)."""
+    global _RAGFLOW_CLIENT, _ES_CLIENT
+    for watcher in list(_PARSE_WATCHERS):
+        watcher.cancel()
+    for client in (_RAGFLOW_CLIENT, _ES_CLIENT):
+        if client is not None:
+            await client.aclose()
+    _RAGFLOW_CLIENT = _ES_CLIENT = None
+
+
+# ============================================================================
+# Request Coalescing & Caching
+# ============================================================================
+
+class TTLCache:
+    """Small LRU cache whose entries also expire after `ttl` seconds."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def get(self, key: str, default=None):
+        entry = self._data.get(key)
+        if entry is None:
+            return default
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def put(self, key: str, value) -> None:
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+# Search results: investigate() re-issues overlapping entity/topic queries, so
+# repeats within a few minutes are served from memory. Cleared on any write.
+SEARCH_CACHE = TTLCache(maxsize=1024, ttl=300)
+
+# Dataset listings change rarely; keyed on query params. Cleared on upload
+# and on dataset create/update.
+DATASETS_CACHE = TTLCache(maxsize=32, ttl=60)
+
+# Knowledge graphs per kb_id, shared by search_knowledge_graph/get_knowledge_graph
+GRAPH_CACHE = TTLCache(maxsize=64, ttl=300)
+
+# Lookup tables built over a cached graph: kb_id -> (graph, index)
+GRAPH_INDEX_CACHE = TTLCache(maxsize=64, ttl=300)
+
+# Whole tools/call responses for read-only tools: repeated identical calls in
+# a session skip dispatch entirely. Cleared by any write (see _invalidate_caches).
+RESPONSE_CACHE = TTLCache(maxsize=256, ttl=60)
+
+# Tool output starting with these is an error message and is never cached
+# (JSON-returning tools report failure as {"success":false,...})
+ERROR_PREFIXES = ("Error", "HTTP Error", '{"success":false')
+# Output containing these reports a partial failure (one of investigate()'s
+# searches, an analyze_kb_need probe); it is returned but never cached either
+ERROR_MARKERS = ("\nError searching", "\nError listing", "\nHTTP Error", '"error":true', '"error": true')
+
+_MISS = object()
+
+# In-flight searches: request key -> future shared by all concurrent callers
+_IN_FLIGHT: Dict[str, asyncio.Future] = {}
+
+
+def _invalidate_caches():
+    """Drop cached results that a write (upload/create/update) can make stale."""
+    SEARCH_CACHE.clear()
+    DATASETS_CACHE.clear()
+    RESPONSE_CACHE.clear()
+
+
+# upload_document clears the caches again once RAGFlow finishes parsing the
+# new document; until then searches can't see its chunks, and results cached
+# in the meantime would stay stale for the full TTL
+PARSE_POLL_INTERVAL = 5.0
+PARSE_POLL_TIMEOUT = 600.0
+# Document "run" states after which its chunks stop changing (codes or names)
+PARSE_FINISHED = frozenset({2, 3, 4, "CANCEL", "DONE", "FAIL"})
+_PARSE_WATCHERS: Set[asyncio.Task] = set()
+
+
+async def _invalidate_when_parsed(dataset_id: str, doc_id: str):
+    """Poll a document until parsing finishes (or times out), then clear the caches."""
+    deadline = time.monotonic() + PARSE_POLL_TIMEOUT
+    try:
+        while time.monotonic() < deadline:
+            await asyncio.sleep(PARSE_POLL_INTERVAL)
+            try:
+                response = await ragflow_request(
+                    "GET", f"/datasets/{dataset_id}/documents/{doc_id}",
+                    headers=get_headers(),
+                    timeout=30.0
+                )
+                doc = orjson.loads(response.content).get("data")
+            except (httpx.HTTPError, orjson.JSONDecodeError):
+                continue
+            if isinstance(doc, dict) and doc.get("run") in PARSE_FINISHED:
+                break
+    finally:
+        _invalidate_caches()
+
+
+def _cacheable(result: Any) -> bool:
+    """Whether a tool result may be cached: anything but (partial) error output."""
+    if not isinstance(result, str):
+        return True
+    return not result.startswith(ERROR_PREFIXES) and not any(marker in result for marker in ERROR_MARKERS)
+
+
+def _request_key(name: str, arguments: Dict[str, Any]) -> str:
+    """Deterministic key for a call: SHA-256 over canonical JSON of name + arguments."""
+    payload = json.dumps({"fn": name, "args": arguments}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+async def _single_flight(key: str, coro_factory):
+    """Run coro_factory() once per key; concurrent callers await the same result."""
+    fut = _IN_FLIGHT.get(key)
+    if fut is None:
+        fut = asyncio.ensure_future(coro_factory())
+        _IN_FLIGHT[key] = fut
+
+        def _release(done, key=key):
+            if _IN_FLIGHT.get(key) is done:
+                del _IN_FLIGHT[key]
+
+        fut.add_done_callback(_release)
+    # shield so one cancelled caller does not cancel the search for the others
+    return await asyncio.shield(fut)
+
+
+def coalesce(cache: Optional[TTLCache] = None, cacheable: Callable[[Any], bool] = _cacheable):
+    """Decorator: collapse concurrent identical calls of an async tool into one.
+
+    With a cache, repeated calls are answered from it (cache miss -> single
+    flight -> populate). Only results passing cacheable() are stored; by
+    default that excludes error output (see _cacheable).
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key = _request_key(func.__name__, bound.arguments)
+
+            if cache is not None:
+                cached = cache.get(key, _MISS)
+                if cached is not _MISS:
+                    return cached
+
+            result = await _single_flight(key, lambda: func(*args, **kwargs))
+
+            if cache is not None and cacheable(result):
+                cache.put(key, result)
+            return result
+
+        return wrapper
+
+    return decorator
+
+
 # Tool definitions for MCP
 TOOLS = [
     {
@@ -332,6 +594,11 @@ TOOLS = [
                     "type": "boolean",
                     "description": "Run sample queries against existing KBs to test if separation is needed",
                     "default": True
+                },
+                "pretty": {
+                    "type": "boolean",
+                    "description": "Indent the JSON result for human reading (default: compact)",
+                    "default": False
                 }
             },
             "required": ["proposed_name", "domain"]
@@ -339,52 +606,182 @@ TOOLS = [
     }
 ]
 
+# TOOLS never changes, so the tools/list result is serialized once
+TOOLS_LIST_RESULT = orjson.dumps({"tools": TOOLS})
+
 
 # ============================================================================
 # Tool Implementations
 # ============================================================================
 
+# Query understanding tables for investigate(), compiled once at import
+
+# Capitalized word runs, e.g. "Gary Cox"
+ENTITY_NAME_RE = re.compile(r'\b[A-Z][a-z]+(?:\s+[A-Z][a-z]+)*\b')
+
+# Intent -> substring markers, checked in priority order
+INTENT_PATTERNS = [
+    (name, re.compile("|".join(map(re.escape, markers))))
+    for name, markers in [
+        ("FIND_SUPPORT", ["find", "prove", "evidence", "show", "support"]),
+        ("FIND_CONTRADICTION", ["contradict", "inconsisten", "conflict"]),
+        ("TIMELINE", ["timeline", "chronolog", "sequence", "when"]),
+    ]
+]
+
+# Known system entities for this case
+KNOWN_ENTITIES = {
+    "dmerx": ["dmerx", "dmrx"],
+    "healthsplash": ["healthsplash", "health splash", "splash"],
+    "blue mosaic": ["blue mosaic", "bluemosaic"],
+    "chris cirri": ["chris cirri", "cirri"],
+    "gary cox": ["gary cox", "cox"],
+    "brett blackman": ["brett blackman", "blackman"],
+}
+
+# Topic -> query patterns
+TOPIC_PATTERNS = [
+    ("compliance", ["compliance", "compliant", "non-compliant"]),
+    ("302", ["302", "fbi", "interview"]),
+    ("feature", ["feature", "functionality", "refused", "wouldn't"]),
+    ("alternative", ["alternative", "own platform", "left", "switched"]),
+    ("doctor", ["doctor", "physician", "prescribe", "decline"]),
+    ("upset", ["upset", "frustrated", "complained", "unhappy"]),
+    ("satisfied", ["satisfied", "happy", "good customer", "stayed"]),
+]
+TOPIC_TERMS = {topic: patterns for topic, patterns in TOPIC_PATTERNS}
+
+
+def _alias_matcher(groups) -> tuple:
+    """Compile (key, aliases) pairs into one pattern plus an alias -> key map.
+
+    The lookahead lets matches overlap, so every alias present in the text is
+    found in a single scan, as with a substring test per alias.
+    """
+    by_alias = {alias: key for key, aliases in groups for alias in aliases}
+    alternation = "|".join(re.escape(a) for a in sorted(by_alias, key=len, reverse=True))
+    return re.compile(f"(?=({alternation}))"), by_alias
+
+
+ENTITY_ALIAS_RE, ENTITY_BY_ALIAS = _alias_matcher(KNOWN_ENTITIES.items())
+TOPIC_ALIAS_RE, TOPIC_BY_ALIAS = _alias_matcher(TOPIC_PATTERNS)
+
+
+async def fetch_datasets(params: Dict[str, Any], **request_kwargs) -> dict:
+    """GET /datasets as parsed JSON; successful responses are cached per params."""
+    key = tuple(sorted(params.items()))
+    data = DATASETS_CACHE.get(key)
+    if data is None:
+        response = await ragflow_request(
+            "GET", "/datasets",
+            headers=get_headers(),
+            params=params,
+            **request_kwargs
+        )
+        response.raise_for_status()
+        data = orjson.loads(response.content)
+        if data.get("code") == 0:
+            DATASETS_CACHE.put(key, data)
+    return data
+
+
+async def fetch_knowledge_graph(kb_id: str) -> dict:
+    """GET a dataset's knowledge graph as parsed JSON; successful responses are cached per kb_id."""
+    data = GRAPH_CACHE.get(kb_id)
+    if data is None:
+        response = await ragflow_request(
+            "GET", f"/datasets/{kb_id}/knowledge_graph",
+            headers=get_headers(),
+            timeout=30.0
+        )
+        response.raise_for_status()
+        data = orjson.loads(response.content)
+        if data.get("code") == 0:
+            GRAPH_CACHE.put(kb_id, data)
+    return data
+
+
+def _extract_page(chunk: dict):
+    """First page number of a chunk (RAGFlow or ES source), or "?" if unknown."""
+    pages = chunk.get("page_num_int")
+    return pages[0] if pages else "?"
+
+
+def _extract_content(chunk: dict) -> str:
+    """Chunk text: content_with_weight if present, else content."""
+    content = chunk.get("content_with_weight")
+    return chunk.get("content", "") if content is None else content
+
+
+def get_graph_index(kb_id: str, graph: dict) -> tuple:
+    """Return (names, nodes_by_id, edges_by_node) for a graph, reusing the last build.
+
+    names is [(lowercased name, node)]; edges_by_node maps a node id to its
+    [(edge, is_outgoing)] in edge order. The index is rebuilt only when the
+    graph for kb_id is a different (re-fetched) object.
+    """
+    cached = GRAPH_INDEX_CACHE.get(kb_id)
+    if cached is not None and cached[0] is graph:
+        return cached[1]
+
+    nodes = graph.get("nodes", [])
+    names = [(n.get("name", "").lower(), n) for n in nodes]
+    nodes_by_id = {}  # first node wins on duplicate ids
+    for n in nodes:
+        nodes_by_id.setdefault(n.get("id"), n)
+    edges_by_node = defaultdict(list)
+    for edge in graph.get("edges", []):
+        source, target = edge.get("source"), edge.get("target")
+        edges_by_node[source].append((edge, True))
+        if target != source:
+            edges_by_node[target].append((edge, False))
+
+    index = (names, nodes_by_id, edges_by_node)
+    GRAPH_INDEX_CACHE.put(kb_id, (graph, index))
+    return index
+
+
+@coalesce(SEARCH_CACHE)
 async def search_knowledge_base(kb_id: str, query: str, top_k: int = 10,
                                  similarity_threshold: float = 0.2) -> str:
     """Search a specific knowledge base using semantic search."""
     try:
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            response = await client.post(
-                f"{RAGFLOW_BASE_URL}/datasets/{kb_id}/chunks/retrieve",
-                headers=get_headers(),
-                json={
-                    "question": query,
-                    "top_k": top_k,
-                    "similarity_threshold": similarity_threshold,
-                    "vector_similarity_weight": 0.3
-                }
-            )
-            response.raise_for_status()
-            data = response.json()
+        response = await ragflow_request(
+            "POST", f"/datasets/{kb_id}/chunks/retrieve",
+            headers=get_headers(),
+            content=orjson.dumps({
+                "question": query,
+                "top_k": top_k,
+                "similarity_threshold": similarity_threshold,
+                "vector_similarity_weight": 0.3
+            })
+        )
+        response.raise_for_status()
+        data = orjson.loads(response.content)
 
-            if data.get("code") != 0:
-                return f"Error: {data.get('message', 'Unknown error')}"
+        if data.get("code") != 0:
+            return f"Error: {data.get('message', 'Unknown error')}"
 
-            chunks = data.get("data", {}).get("chunks", [])
-            if not chunks:
-                return f"No results found for query: '{query}' in KB {kb_id}"
+        chunks = data.get("data", {}).get("chunks", [])
+        if not chunks:
+            return f"No results found for query: '{query}' in KB {kb_id}"
 
-            output = f"**Found {len(chunks)} chunks for '{query}':**\n\n"
-            for i, chunk in enumerate(chunks, 1):
-                score = chunk.get("similarity", 0)
-                content = chunk.get("content_with_weight", chunk.get("content", ""))[:500]
-                doc_name = chunk.get("document_name", "Unknown")
-                page = chunk.get("page_num_int", ["?"])[0] if chunk.get("page_num_int") else "?"
+        parts = [f"**Found {len(chunks)} chunks for '{query}':**\n\n"]
+        for i, chunk in enumerate(chunks, 1):
+            score = chunk.get("similarity", 0)
+            content = _extract_content(chunk)[:500]
+            doc_name = chunk.get("document_name", "Unknown")
+            page = _extract_page(chunk)
 
-                output += f"**{i}. [{doc_name}] (Page {page}, Score: {score:.2f})**\n"
-                output += f"{content}...\n\n"
+            parts.append(f"**{i}. [{doc_name}] (Page {page}, Score: {score:.2f})**\n")
+            parts.append(f"{content}...\n\n")
 
-                # Include keywords if available
-                keywords = chunk.get("important_kwd", [])
-                if keywords:
-                    output += f"   Keywords: {', '.join(keywords[:5])}\n\n"
+            # Include keywords if available
+            keywords = chunk.get("important_kwd", [])
+            if keywords:
+                parts.append(f"   Keywords: {', '.join(keywords[:5])}\n\n")
 
-            return output
+        return "".join(parts)
 
     except httpx.HTTPStatusError as e:
         return f"HTTP Error searching KB: {e.response.status_code} - {e.response.text}"
@@ -392,114 +789,193 @@ async def search_knowledge_base(kb_id: str, query: str, top_k: int = 10,
         return f"Error searching knowledge base: {str(e)}"
 
 
-async def search_all_kbs(query: str, top_k: int = 5, similarity_threshold: float = 0.3) -> str:
-    """Search across all knowledge bases."""
-    try:
-        # First get list of all datasets
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            datasets_response = await client.get(
-                f"{RAGFLOW_BASE_URL}/datasets",
+class RAGFlowAPIError(Exception):
+    """RAGFlow answered with a non-zero result code."""
+
+
+# Only complete searches are cached: with a KB failing (RAGFlow restarting,
+# a 5xx, a timeout) the hits are partial, or empty for a short outage
+@coalesce(SEARCH_CACHE, cacheable=lambda result: not result[2])
+async def search_all_kbs_raw(query: str, top_k: int = 5, similarity_threshold: float = 0.3) -> tuple:
+    """Search across all knowledge bases, returning (kb_count, top hits, failed KB count).
+
+    Hits are (kb_name, kb_id, chunk) tuples, best similarity first, at most
+    top_k * 3. Raises RAGFlowAPIError if the datasets can't be listed.
+    """
+    # First get list of all datasets
+    # Only id/name/chunk_count are used; servers that ignore "fields" send everything
+    datasets_data = await fetch_datasets({"page": 1, "page_size": 100, "fields": "id,name,chunk_count"})
+
+    if datasets_data.get("code") != 0:
+        raise RAGFlowAPIError(datasets_data.get("message"))
+
+    datasets = datasets_data.get("data", [])
+    if not datasets:
+        return 0, [], 0
+
+    # dataset id -> name for every non-empty dataset (skip empty KBs)
+    active_kbs = {
+        ds.get("id"): ds.get("name", "Unknown")
+        for ds in datasets if ds.get("chunk_count", 0) > 0
+    }
+    kb_count = len(datasets)
+    del datasets_data, datasets  # only active_kbs is needed from here on
+
+    async def search_combined() -> Optional[List[tuple]]:
+        """One retrieval over all datasets, or None if the server can't do it."""
+        global _COMBINED_RETRIEVAL, _COMBINED_RETRY_AT
+        # top_k bounds the candidate pool across all datasets together, so
+        # scale it to keep top_k candidates per KB as the fan-out does
+        combined_top_k = top_k * len(active_kbs)
+        try:
+            response = await ragflow_request(
+                "POST", "/retrieval",
                 headers=get_headers(),
-                params={"page": 1, "page_size": 100}
+                content=orjson.dumps({
+                    "question": query,
+                    "dataset_ids": list(active_kbs),
+                    "top_k": combined_top_k,
+                    "page_size": combined_top_k,
+                    "similarity_threshold": similarity_threshold
+                })
+            )
+        except httpx.HTTPError:
+            return None  # transient; fall back to per-KB search this time
+        if response.is_error:
+            if response.status_code in (404, 405):  # no combined endpoint
+                _COMBINED_RETRIEVAL = False
+                _COMBINED_RETRY_AT = time.monotonic() + COMBINED_RETRY_AFTER
+            return None
+        try:
+            data = orjson.loads(response.content)
+        except orjson.JSONDecodeError:
+            return None
+        if data.get("code") != 0:
+            # Datasets with different embedding models can't be searched
+            # together; stop probing for a while. Any other failure (e.g. a
+            # dataset deleted since DATASETS_CACHE was filled) is per call.
+            if "embedding model" in str(data.get("message", "")).lower():
+                _COMBINED_RETRIEVAL = False
+                _COMBINED_RETRY_AT = time.monotonic() + COMBINED_RETRY_AFTER
+            return None
+        _COMBINED_RETRIEVAL = True
+        hits = []
+        for chunk in data.get("data", {}).get("chunks", []):
+            kb_id = chunk.get("kb_id") or chunk.get("dataset_id")
+            hits.append((active_kbs.get(kb_id, "Unknown"), kb_id, chunk))
+        return hits
+
+    # Otherwise search every dataset concurrently, bounded by a semaphore
+    sem = asyncio.Semaphore(SEARCH_CONCURRENCY)
+
+    async def search_one_kb(ds_id: str, ds_name: str) -> List[tuple]:
+        async with sem:
+            search_response = await ragflow_request(
+                "POST", f"/datasets/{ds_id}/chunks/retrieve",
+                headers=get_headers(),
+                content=orjson.dumps({
+                    "question": query,
+                    "top_k": top_k,
+                    "similarity_threshold": similarity_threshold
+                })
             )
-            datasets_response.raise_for_status()
-            datasets_data = datasets_response.json()
-
-            if datasets_data.get("code") != 0:
-                return f"Error listing datasets: {datasets_data.get('message')}"
-
-            datasets = datasets_data.get("data", [])
-            if not datasets:
-                return "No knowledge bases found"
-
-            all_results = []
-
-            # Search each dataset
-            for ds in datasets:
-                ds_id = ds.get("id")
-                ds_name = ds.get("name", "Unknown")
-
-                if ds.get("chunk_count", 0) == 0:
-                    continue  # Skip empty KBs
-
-                try:
-                    search_response = await client.post(
-                        f"{RAGFLOW_BASE_URL}/datasets/{ds_id}/chunks/retrieve",
-                        headers=get_headers(),
-                        json={
-                            "question": query,
-                            "top_k": top_k,
-                            "similarity_threshold": similarity_threshold
-                        }
-                    )
-                    search_response.raise_for_status()
-                    search_data = search_response.json()
-
-                    if search_data.get("code") == 0:
-                        chunks = search_data.get("data", {}).get("chunks", [])
-                        for chunk in chunks:
-                            chunk["_kb_name"] = ds_name
-                            chunk["_kb_id"] = ds_id
-                        all_results.extend(chunks)
-                except:
-                    continue  # Skip failed KBs
-
-            if not all_results:
-                return f"No results found for query: '{query}' across all knowledge bases"
-
-            # Sort by similarity and take top results
-            all_results.sort(key=lambda x: x.get("similarity", 0), reverse=True)
-            top_results = all_results[:top_k * 3]  # Return more since we searched multiple KBs
-
-            output = f"**Found {len(top_results)} results for '{query}' across {len(datasets)} KBs:**\n\n"
-            for i, chunk in enumerate(top_results, 1):
-                score = chunk.get("similarity", 0)
-                content = chunk.get("content_with_weight", chunk.get("content", ""))[:400]
-                kb_name = chunk.get("_kb_name", "Unknown")
-                doc_name = chunk.get("document_name", "Unknown")
-
-                output += f"**{i}. [{kb_name}] {doc_name} (Score: {score:.2f})**\n"
-                output += f"{content}...\n\n"
-
-            return output
+        search_response.raise_for_status()
+        search_data = orjson.loads(search_response.content)
+
+        if search_data.get("code") != 0:
+            raise RAGFlowAPIError(search_data.get("message"))
+        chunks = search_data.get("data", {}).get("chunks", [])
+        return [(ds_name, ds_id, chunk) for chunk in chunks]
+
+    # (kb_name, kb_id, chunk) tuples: tag hits without mutating RAGFlow's dicts
+    all_results = None
+    failed = 0
+    if active_kbs and (_COMBINED_RETRIEVAL is not False or time.monotonic() >= _COMBINED_RETRY_AT):
+        all_results = await search_combined()
+    if all_results is None:
+        kb_results = await asyncio.gather(
+            *(search_one_kb(ds_id, ds_name) for ds_id, ds_name in active_kbs.items()),
+            return_exceptions=True
+        )
+        all_results = []
+        for hits in kb_results:
+            if isinstance(hits, BaseException):
+                failed += 1  # Skip failed KBs, but count them
+            else:
+                all_results.extend(hits)
+
+    if not all_results:
+        return kb_count, [], failed
+
+    # Keep only the best hits: bounded heap instead of sorting every chunk,
+    # unless we keep most of them anyway, where a plain sort is cheaper
+    limit = top_k * 3  # Return more since we searched multiple KBs
+    by_similarity = lambda hit: hit[2].get("similarity", 0)
+    if limit * 4 >= len(all_results) * 3:
+        top_results = sorted(all_results, key=by_similarity, reverse=True)[:limit]
+    else:
+        top_results = heapq.nlargest(limit, all_results, key=by_similarity)
+
+    return kb_count, top_results, failed
 
+
+async def search_all_kbs(query: str, top_k: int = 5, similarity_threshold: float = 0.3) -> str:
+    """Search across all knowledge bases."""
+    try:
+        kb_count, top_results, failed = await search_all_kbs_raw(query, top_k, similarity_threshold)
+    except RAGFlowAPIError as e:
+        return f"Error listing datasets: {e}"
     except Exception as e:
         return f"Error searching all KBs: {str(e)}"
 
+    if not kb_count:
+        return "No knowledge bases found"
+    if failed and not top_results:
+        return f"Error searching all KBs: all {failed} knowledge base searches failed"
+    if not top_results:
+        return f"No results found for query: '{query}' across all knowledge bases"
+
+    parts = [f"**Found {len(top_results)} results for '{query}' across {kb_count} KBs:**\n\n"]
+    for i, (kb_name, kb_id, chunk) in enumerate(top_results, 1):
+        score = chunk.get("similarity", 0)
+        content = _extract_content(chunk)[:400]
+        doc_name = chunk.get("document_name", "Unknown")
+
+        parts.append(f"**{i}. [{kb_name}] {doc_name} (Score: {score:.2f})**\n")
+        parts.append(f"{content}...\n\n")
+
+    if failed:
+        # Keeps the partial result out of RESPONSE_CACHE too (see ERROR_MARKERS)
+        parts.append(f"\nError searching {failed} knowledge base(s); results may be incomplete.\n")
+
+    return "".join(parts)
+
 
 async def list_datasets(page: int = 1, page_size: int = 30) -> str:
     """List all datasets/knowledge bases."""
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.get(
-                f"{RAGFLOW_BASE_URL}/datasets",
-                headers=get_headers(),
-                params={"page": page, "page_size": page_size, "orderby": "create_time", "desc": "true"}
-            )
-            response.raise_for_status()
-            data = response.json()
-
-            if data.get("code") != 0:
-                return f"Error: {data.get('message', 'Unknown error')}"
+        data = await fetch_datasets(
+            {"page": page, "page_size": page_size, "orderby": "create_time", "desc": "true"},
+            timeout=30.0
+        )
 
-            datasets = data.get("data", [])
-            if not datasets:
-                return "No knowledge bases found"
+        if data.get("code") != 0:
+            return f"Error: {data.get('message', 'Unknown error')}"
 
-            output = f"**Knowledge Bases ({len(datasets)} total):**\n\n"
-            for ds in datasets:
-                name = ds.get("name", "Unknown")
-                ds_id = ds.get("id", "")
-                doc_count = ds.get("document_count", 0)
-                chunk_count = ds.get("chunk_count", 0)
-                embedding = ds.get("embedding_model", "Unknown")
+        datasets = data.get("data", [])
+        if not datasets:
+            return "No knowledge bases found"
 
-                output += f"**{name}**\n"
-                output += f"   ID: `{ds_id}`\n"
-                output += f"   Documents: {doc_count} | Chunks: {chunk_count}\n"
-                output += f"   Embedding: {embedding}\n\n"
+        parts = [f"**Knowledge Bases ({len(datasets)} total):**\n\n"]
+        for ds in datasets:
+            parts.append(
+                f"**{ds.get('name', 'Unknown')}**\n"
+                f"   ID: `{ds.get('id', '')}`\n"
+                f"   Documents: {ds.get('document_count', 0)} | Chunks: {ds.get('chunk_count', 0)}\n"
+                f"   Embedding: {ds.get('embedding_model', 'Unknown')}\n\n"
+            )
 
-            return output
+        return "".join(parts)
 
     except Exception as e:
         return f"Error listing datasets: {str(e)}"
@@ -508,32 +984,32 @@ async def list_datasets(page: int = 1, page_size: int = 30) -> str:
 async def get_document(dataset_id: str, document_id: str) -> str:
     """Get a specific document's metadata."""
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.get(
-                f"{RAGFLOW_BASE_URL}/datasets/{dataset_id}/documents/{document_id}",
-                headers=get_headers()
-            )
-            response.raise_for_status()
-            data = response.json()
+        response = await ragflow_request(
+            "GET", f"/datasets/{dataset_id}/documents/{document_id}",
+            headers=get_headers(),
+            timeout=30.0
+        )
+        response.raise_for_status()
+        data = orjson.loads(response.content)
 
-            if data.get("code") != 0:
-                return f"Error: {data.get('message', 'Unknown error')}"
+        if data.get("code") != 0:
+            return f"Error: {data.get('message', 'Unknown error')}"
 
-            doc = data.get("data", {})
-            if not doc:
-                return f"Document not found: {document_id}"
+        doc = data.get("data", {})
+        if not doc:
+            return f"Document not found: {document_id}"
 
-            output = f"**Document: {doc.get('name', 'Unknown')}**\n\n"
-            output += f"**ID:** `{doc.get('id')}`\n"
-            output += f"**Status:** {doc.get('run', 'Unknown')}\n"
-            output += f"**Size:** {doc.get('size', 0):,} bytes\n"
-            output += f"**Chunks:** {doc.get('chunk_count', 0)}\n"
-            output += f"**Type:** {doc.get('type', 'Unknown')}\n"
+        output = f"**Document: {doc.get('name', 'Unknown')}**\n\n"
+        output += f"**ID:** `{doc.get('id')}`\n"
+        output += f"**Status:** {doc.get('run', 'Unknown')}\n"
+        output += f"**Size:** {doc.get('size', 0):,} bytes\n"
+        output += f"**Chunks:** {doc.get('chunk_count', 0)}\n"
+        output += f"**Type:** {doc.get('type', 'Unknown')}\n"
 
-            if doc.get('process_begin_at'):
-                output += f"**Processed:** {doc.get('process_begin_at')}\n"
+        if doc.get('process_begin_at'):
+            output += f"**Processed:** {doc.get('process_begin_at')}\n"
 
-            return output
+        return output
 
     except Exception as e:
         return f"Error getting document: {str(e)}"
@@ -543,37 +1019,36 @@ async def get_document_chunks(dataset_id: str, document_id: str,
                                page: int = 1, page_size: int = 100) -> str:
     """Get chunks for a specific document."""
     try:
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            response = await client.get(
-                f"{RAGFLOW_BASE_URL}/datasets/{dataset_id}/documents/{document_id}/chunks",
-                headers=get_headers(),
-                params={"page": page, "page_size": page_size}
-            )
-            response.raise_for_status()
-            data = response.json()
+        response = await ragflow_request(
+            "GET", f"/datasets/{dataset_id}/documents/{document_id}/chunks",
+            headers=get_headers(),
+            params={"page": page, "page_size": page_size}
+        )
+        response.raise_for_status()
+        data = orjson.loads(response.content)
 
-            if data.get("code") != 0:
-                return f"Error: {data.get('message', 'Unknown error')}"
+        if data.get("code") != 0:
+            return f"Error: {data.get('message', 'Unknown error')}"
 
-            chunks = data.get("data", {}).get("chunks", [])
-            total = data.get("data", {}).get("total", 0)
+        chunks = data.get("data", {}).get("chunks", [])
+        total = data.get("data", {}).get("total", 0)
 
-            if not chunks:
-                return f"No chunks found for document {document_id}"
+        if not chunks:
+            return f"No chunks found for document {document_id}"
 
-            output = f"**Document Chunks ({len(chunks)} of {total} total):**\n\n"
-            for i, chunk in enumerate(chunks, 1):
-                content = chunk.get("content_with_weight", chunk.get("content", ""))[:300]
-                page_num = chunk.get("page_num_int", ["?"])[0] if chunk.get("page_num_int") else "?"
-                keywords = chunk.get("important_kwd", [])
+        parts = [f"**Document Chunks ({len(chunks)} of {total} total):**\n\n"]
+        for i, chunk in enumerate(chunks, 1):
+            content = _extract_content(chunk)[:300]
+            page_num = _extract_page(chunk)
+            keywords = chunk.get("important_kwd", [])
 
-                output += f"**Chunk {i} (Page {page_num}):**\n"
-                output += f"{content}...\n"
-                if keywords:
-                    output += f"   Keywords: {', '.join(keywords[:5])}\n"
-                output += "\n"
+            parts.append(f"**Chunk {i} (Page {page_num}):**\n")
+            parts.append(f"{content}...\n")
+            if keywords:
+                parts.append(f"   Keywords: {', '.join(keywords[:5])}\n")
+            parts.append("\n")
 
-            return output
+        return "".join(parts)
 
     except Exception as e:
         return f"Error getting document chunks: {str(e)}"
@@ -582,60 +1057,53 @@ async def get_document_chunks(dataset_id: str, document_id: str,
 async def search_knowledge_graph(kb_id: str, entity_name: str) -> str:
     """Search knowledge graph for an entity."""
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            # Get the knowledge graph
-            response = await client.get(
-                f"{RAGFLOW_BASE_URL}/datasets/{kb_id}/knowledge_graph",
-                headers=get_headers()
-            )
-            response.raise_for_status()
-            data = response.json()
+        # Get the knowledge graph
+        data = await fetch_knowledge_graph(kb_id)
 
-            if data.get("code") != 0:
-                return f"Error: {data.get('message', 'Unknown error')}"
+        if data.get("code") != 0:
+            return f"Error: {data.get('message', 'Unknown error')}"
 
-            graph = data.get("data", {}).get("graph", {})
-            if not graph:
-                return f"No knowledge graph found for KB {kb_id}. Run GraphRAG first."
+        graph = data.get("data", {}).get("graph", {})
+        if not graph:
+            return f"No knowledge graph found for KB {kb_id}. Run GraphRAG first."
 
-            nodes = graph.get("nodes", [])
-            edges = graph.get("edges", [])
+        names, nodes_by_id, edges_by_node = get_graph_index(kb_id, graph)
 
-            # Search for matching nodes
-            entity_lower = entity_name.lower()
-            matching_nodes = [n for n in nodes if entity_lower in n.get("name", "").lower()]
+        # Search for matching nodes (only the first 5 are reported)
+        entity_lower = entity_name.lower()
+        matching_nodes = list(islice((n for name, n in names if entity_lower in name), 5))
 
-            if not matching_nodes:
-                return f"No entities found matching '{entity_name}' in knowledge graph"
+        if not matching_nodes:
+            return f"No entities found matching '{entity_name}' in knowledge graph"
 
-            output = f"**Knowledge Graph Results for '{entity_name}':**\n\n"
+        parts = [f"**Knowledge Graph Results for '{entity_name}':**\n\n"]
 
-            for node in matching_nodes[:5]:
-                node_id = node.get("id")
-                node_name = node.get("name")
-                node_type = node.get("type", "unknown")
+        for node in matching_nodes:
+            node_id = node.get("id")
+            node_name = node.get("name")
+            node_type = node.get("type", "unknown")
 
-                output += f"**Entity: {node_name}** (Type: {node_type})\n"
+            parts.append(f"**Entity: {node_name}** (Type: {node_type})\n")
 
-                # Find relationships for this node
-                related = []
-                for edge in edges:
-                    if edge.get("source") == node_id:
-                        target_node = next((n for n in nodes if n.get("id") == edge.get("target")), None)
-                        if target_node:
-                            related.append(f"  → {edge.get('relationship', 'related to')} → {target_node.get('name')}")
-                    elif edge.get("target") == node_id:
-                        source_node = next((n for n in nodes if n.get("id") == edge.get("source")), None)
-                        if source_node:
-                            related.append(f"  ← {edge.get('relationship', 'related to')} ← {source_node.get('name')}")
+            # Find relationships for this node
+            related = []
+            for edge, is_outgoing in edges_by_node.get(node_id, ()):
+                if is_outgoing:
+                    target_node = nodes_by_id.get(edge.get("target"))
+                    if target_node:
+                        related.append(f"  → {edge.get('relationship', 'related to')} → {target_node.get('name')}")
+                else:
+                    source_node = nodes_by_id.get(edge.get("source"))
+                    if source_node:
+                        related.append(f"  ← {edge.get('relationship', 'related to')} ← {source_node.get('name')}")
 
-                if related:
-                    output += "Relationships:\n"
-                    for rel in related[:10]:
-                        output += f"{rel}\n"
-                output += "\n"
+            if related:
+                parts.append("Relationships:\n")
+                for rel in related[:10]:
+                    parts.append(f"{rel}\n")
+            parts.append("\n")
 
-            return output
+        return "".join(parts)
 
     except Exception as e:
         return f"Error searching knowledge graph: {str(e)}"
@@ -644,50 +1112,48 @@ async def search_knowledge_graph(kb_id: str, entity_name: str) -> str:
 async def get_knowledge_graph(kb_id: str) -> str:
     """Get full knowledge graph for a dataset."""
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.get(
-                f"{RAGFLOW_BASE_URL}/datasets/{kb_id}/knowledge_graph",
-                headers=get_headers()
-            )
-            response.raise_for_status()
-            data = response.json()
+        data = await fetch_knowledge_graph(kb_id)
 
-            if data.get("code") != 0:
-                return f"Error: {data.get('message', 'Unknown error')}"
+        if data.get("code") != 0:
+            return f"Error: {data.get('message', 'Unknown error')}"
 
-            graph = data.get("data", {}).get("graph", {})
-            mind_map = data.get("data", {}).get("mind_map", {})
+        graph = data.get("data", {}).get("graph", {})
+        mind_map = data.get("data", {}).get("mind_map", {})
 
-            if not graph and not mind_map:
-                return f"No knowledge graph found for KB {kb_id}. GraphRAG may not have been run yet."
+        if not graph and not mind_map:
+            return f"No knowledge graph found for KB {kb_id}. GraphRAG may not have been run yet."
 
-            nodes = graph.get("nodes", [])
-            edges = graph.get("edges", [])
+        nodes = graph.get("nodes", [])
+        edges = graph.get("edges", [])
 
-            output = f"**Knowledge Graph for KB {kb_id}:**\n\n"
-            output += f"**Entities:** {len(nodes)}\n"
-            output += f"**Relationships:** {len(edges)}\n\n"
+        parts = [f"**Knowledge Graph for KB {kb_id}:**\n\n"]
+        parts.append(f"**Entities:** {len(nodes)}\n")
+        parts.append(f"**Relationships:** {len(edges)}\n\n")
 
-            # Group nodes by type
-            type_counts: Dict[str, int] = {}
-            for node in nodes:
-                node_type = node.get("type", "unknown")
-                type_counts[node_type] = type_counts.get(node_type, 0) + 1
+        # Group nodes by type
+        type_counts: Dict[str, int] = {}
+        for node in nodes:
+            node_type = node.get("type", "unknown")
+            type_counts[node_type] = type_counts.get(node_type, 0) + 1
 
-            output += "**Entity Types:**\n"
-            for entity_type, count in sorted(type_counts.items(), key=lambda x: -x[1]):
-                output += f"  - {entity_type}: {count}\n"
+        parts.append("**Entity Types:**\n")
+        for entity_type, count in sorted(type_counts.items(), key=lambda x: -x[1]):
+            parts.append(f"  - {entity_type}: {count}\n")
 
-            output += "\n**Sample Entities (first 20):**\n"
-            for node in nodes[:20]:
-                output += f"  - {node.get('name')} ({node.get('type', 'unknown')})\n"
+        parts.append("\n**Sample Entities (first 20):**\n")
+        for node in nodes[:20]:
+            parts.append(f"  - {node.get('name')} ({node.get('type', 'unknown')})\n")
 
-            return output
+        return "".join(parts)
 
     except Exception as e:
         return f"Error getting knowledge graph: {str(e)}"
 
 
+# RAGFlow document "run" codes
+DOC_STATUS_LABELS = {0: "UNSTART", 1: "RUNNING", 2: "CANCEL", 3: "DONE", 4: "FAIL"}
+
+
 async def list_documents(dataset_id: str, page: int = 1, page_size: int = 30,
                           status: str = None) -> str:
     """List documents in a dataset."""
@@ -697,39 +1163,34 @@ async def list_documents(dataset_id: str, page: int = 1, page_size: int = 30,
             status_map = {"DONE": 3, "RUNNING": 1, "FAIL": 4, "UNSTART": 0}
             params["run"] = status_map.get(status, status)
 
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.get(
-                f"{RAGFLOW_BASE_URL}/datasets/{dataset_id}/documents",
-                headers=get_headers(),
-                params=params
-            )
-            response.raise_for_status()
-            data = response.json()
-
-            if data.get("code") != 0:
-                return f"Error: {data.get('message', 'Unknown error')}"
-
-            docs = data.get("data", {}).get("docs", [])
-            total = data.get("data", {}).get("total", 0)
+        response = await ragflow_request(
+            "GET", f"/datasets/{dataset_id}/documents",
+            headers=get_headers(),
+            params=params,
+            timeout=30.0
+        )
+        response.raise_for_status()
+        data = orjson.loads(response.content)
 
-            if not docs:
-                return f"No documents found in dataset {dataset_id}"
+        if data.get("code") != 0:
+            return f"Error: {data.get('message', 'Unknown error')}"
 
-            status_labels = {0: "UNSTART", 1: "RUNNING", 2: "CANCEL", 3: "DONE", 4: "FAIL"}
+        docs = data.get("data", {}).get("docs", [])
+        total = data.get("data", {}).get("total", 0)
 
-            output = f"**Documents ({len(docs)} of {total} total):**\n\n"
-            for doc in docs:
-                name = doc.get("name", "Unknown")
-                doc_id = doc.get("id", "")
-                run_status = status_labels.get(doc.get("run", 0), "Unknown")
-                chunk_count = doc.get("chunk_count", 0)
-                size = doc.get("size", 0)
+        if not docs:
+            return f"No documents found in dataset {dataset_id}"
 
-                output += f"**{name}**\n"
-                output += f"   ID: `{doc_id}`\n"
-                output += f"   Status: {run_status} | Chunks: {chunk_count} | Size: {size:,} bytes\n\n"
+        parts = [f"**Documents ({len(docs)} of {total} total):**\n\n"]
+        for doc in docs:
+            run_status = DOC_STATUS_LABELS.get(doc.get("run", 0), "Unknown")
+            parts.append(
+                f"**{doc.get('name', 'Unknown')}**\n"
+                f"   ID: `{doc.get('id', '')}`\n"
+                f"   Status: {run_status} | Chunks: {doc.get('chunk_count', 0)} | Size: {doc.get('size', 0):,} bytes\n\n"
+            )
 
-            return output
+        return "".join(parts)
 
     except Exception as e:
         return f"Error listing documents: {str(e)}"
@@ -743,10 +1204,9 @@ async def upload_document(dataset_id: str, content: str, filename: str,
     and other generated content into knowledge bases for future retrieval.
     """
     try:
-        import io
         from datetime import datetime
 
-        # Create file-like object from content
+        # Encode the body once; a metadata header is prepended as bytes
         file_content = content.encode('utf-8')
 
         # Add metadata header to content if provided
@@ -760,57 +1220,139 @@ async def upload_document(dataset_id: str, content: str, filename: str,
             meta_lines.append(f"uploaded_at: {datetime.utcnow().isoformat()}")
             meta_lines.append(f"---\n")
             meta_header = '\n'.join(meta_lines)
-            file_content = (meta_header + content).encode('utf-8')
+            file_content = b"".join([meta_header.encode('utf-8'), file_content])
 
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            # RAGFlow expects multipart form data for document upload
-            files = {
-                'file': (filename, io.BytesIO(file_content), 'text/plain')
-            }
+        # RAGFlow expects multipart form data for document upload
+        files = {
+            'file': (filename, file_content, 'text/plain')
+        }
 
-            # Remove Content-Type from headers for multipart
-            headers = {"Authorization": f"Bearer {API_TOKEN}"} if API_TOKEN else {}
+        # Remove Content-Type from headers for multipart
+        headers = {"Authorization": f"Bearer {API_TOKEN}"} if API_TOKEN else {}
 
-            response = await client.post(
-                f"{RAGFLOW_BASE_URL}/datasets/{dataset_id}/documents",
-                headers=headers,
-                files=files
-            )
-            response.raise_for_status()
-            data = response.json()
+        response = await ragflow_request(
+            "POST", f"/datasets/{dataset_id}/documents",
+            headers=headers,
+            files=files
+        )
+        response.raise_for_status()
+        data = orjson.loads(response.content)
 
-            if data.get("code") != 0:
-                return json.dumps({
-                    "success": False,
-                    "error": data.get('message', 'Unknown error')
-                })
+        if data.get("code") != 0:
+            return orjson.dumps({
+                "success": False,
+                "error": data.get('message', 'Unknown error')
+            }).decode()
 
-            doc_info = data.get("data", [{}])[0] if data.get("data") else {}
-            doc_id = doc_info.get("id", "unknown")
+        # New content changes listings now and searches once parsed (see
+        # _invalidate_when_parsed)
+        _invalidate_caches()
 
-            # Trigger parsing
-            parse_response = await client.post(
-                f"{RAGFLOW_BASE_URL}/datasets/{dataset_id}/documents/{doc_id}/run",
-                headers=get_headers()
-            )
+        doc_info = data.get("data", [{}])[0] if data.get("data") else {}
+        doc_id = doc_info.get("id", "unknown")
 
-            parse_triggered = parse_response.status_code == 200
+        # Trigger parsing
+        parse_response = await ragflow_request(
+            "POST", f"/datasets/{dataset_id}/documents/{doc_id}/run",
+            headers=get_headers()
+        )
 
-            return json.dumps({
-                "success": True,
-                "document_id": doc_id,
-                "filename": filename,
-                "dataset_id": dataset_id,
-                "size_bytes": len(file_content),
-                "parsing_triggered": parse_triggered,
-                "metadata": metadata
-            })
+        parse_triggered = parse_response.status_code == 200
+        if parse_triggered:
+            watcher = asyncio.create_task(_invalidate_when_parsed(dataset_id, doc_id))
+            _PARSE_WATCHERS.add(watcher)
+            watcher.add_done_callback(_PARSE_WATCHERS.discard)
+
+        return orjson.dumps({
+            "success": True,
+            "document_id": doc_id,
+            "filename": filename,
+            "dataset_id": dataset_id,
+            "size_bytes": len(file_content),
+            "parsing_triggered": parse_triggered,
+            "metadata": metadata
+        }).decode()
 
     except Exception as e:
-        return json.dumps({
+        return orjson.dumps({
             "success": False,
             "error": str(e)
-        })
+        }).decode()
+
+
+def build_es_query(query_type: str = "match", must_terms: List[str] = None,
+                   should_terms: List[str] = None, search_term: str = None,
+                   kb_ids: List[str] = None, size: int = 30) -> Optional[dict]:
+    """Build the ES request body for a keyword search, or None if the arguments are invalid."""
+    if query_type == "match" and search_term:
+        query = {"match": {"content_ltks": search_term}}
+    elif query_type == "match_phrase" and search_term:
+        query = {"match_phrase": {"content_ltks": search_term}}
+    elif query_type == "bool":
+        bool_query = {}
+        if must_terms:
+            bool_query["must"] = [{"match": {"content_ltks": term}} for term in must_terms]
+        if should_terms:
+            bool_query["should"] = [{"match": {"content_ltks": term}} for term in should_terms]
+            if not must_terms:
+                bool_query["minimum_should_match"] = 1
+        query = {"bool": bool_query}
+    else:
+        return None
+
+    # Add KB filter if specified
+    if kb_ids:
+        query = {
+            "bool": {
+                "must": [query],
+                "filter": [{"terms": {"kb_id": kb_ids}}]
+            }
+        }
+
+    return {
+        "query": query,
+        "size": size,
+        "_source": ["content_with_weight", "docnm_kwd", "important_kwd", "kb_id", "doc_id", "page_num_int"]
+    }
+
+
+@coalesce(SEARCH_CACHE)
+async def fetch_es_hits(es_query: dict) -> dict:
+    """Run an ES search and return its "hits" object (hits list + total)."""
+    index_name = f"ragflow_{TENANT_ID}"
+    client = get_es_client()
+    response = await client.post(
+        f"/{index_name}/_search",
+        headers={"Content-Type": "application/json"},
+        content=orjson.dumps(es_query)
+    )
+    response.raise_for_status()
+    return orjson.loads(response.content).get("hits", {})
+
+
+def format_es_hits(hits: List[dict], total: int) -> str:
+    """Render ES hits as the markdown listing returned by search_elasticsearch."""
+    if not hits:
+        return f"No results found. Total matches: 0"
+
+    parts = [f"**Found {total} total matches (showing {len(hits)}):**\n\n"]
+
+    append = parts.append
+    for i, hit in enumerate(hits, 1):
+        source = hit.get("_source", {})
+        content = source.get("content_with_weight", "")
+        if len(content) > 500:
+            content = content[:500]
+        page = _extract_page(source)
+
+        append(f"### {i}. [{source.get('docnm_kwd', 'Unknown')}] (Page {page}, Score: {hit.get('_score', 0):.2f})\n")
+        append(f"{content}...\n")
+        keywords = source.get("important_kwd")
+        if keywords:
+            append(f"**Keywords:** {', '.join(keywords if len(keywords) <= 5 else keywords[:5])}\n")
+        append("\n")
+
+    return "".join(parts)
 
 
 async def search_elasticsearch(query_type: str = "match", must_terms: List[str] = None,
@@ -822,74 +1364,12 @@ async def search_elasticsearch(query_type: str = "match", must_terms: List[str]
     Essential for finding exact terms, names, and phrases that semantic search might miss.
     """
     try:
-        es_url = f"http://{ES_HOST}:{ES_PORT}"
-        index_name = f"ragflow_{TENANT_ID}"
-
-        # Build the query based on type
-        if query_type == "match" and search_term:
-            query = {"match": {"content_ltks": search_term}}
-        elif query_type == "match_phrase" and search_term:
-            query = {"match_phrase": {"content_ltks": search_term}}
-        elif query_type == "bool":
-            bool_query = {}
-            if must_terms:
-                bool_query["must"] = [{"match": {"content_ltks": term}} for term in must_terms]
-            if should_terms:
-                bool_query["should"] = [{"match": {"content_ltks": term}} for term in should_terms]
-                if not must_terms:
-                    bool_query["minimum_should_match"] = 1
-            query = {"bool": bool_query}
-        else:
+        es_query = build_es_query(query_type, must_terms, should_terms, search_term, kb_ids, size)
+        if es_query is None:
             return "Error: Invalid query. Provide search_term for match/match_phrase, or must_terms/should_terms for bool."
 
-        # Add KB filter if specified
-        if kb_ids:
-            query = {
-                "bool": {
-                    "must": [query],
-                    "filter": [{"terms": {"kb_id": kb_ids}}]
-                }
-            }
-
-        es_query = {
-            "query": query,
-            "size": size,
-            "_source": ["content_with_weight", "docnm_kwd", "important_kwd", "kb_id", "doc_id", "page_num_int"]
-        }
-
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            response = await client.post(
-                f"{es_url}/{index_name}/_search",
-                headers={"Content-Type": "application/json"},
-                json=es_query
-            )
-            response.raise_for_status()
-            data = response.json()
-
-            hits = data.get("hits", {}).get("hits", [])
-            total = data.get("hits", {}).get("total", {}).get("value", 0)
-
-            if not hits:
-                return f"No results found. Total matches: 0"
-
-            # Format output
-            output = f"**Found {total} total matches (showing {len(hits)}):**\n\n"
-
-            for i, hit in enumerate(hits, 1):
-                source = hit.get("_source", {})
-                score = hit.get("_score", 0)
-                content = source.get("content_with_weight", "")[:500]
-                doc_name = source.get("docnm_kwd", "Unknown")
-                keywords = source.get("important_kwd", [])
-                page = source.get("page_num_int", [None])[0] if source.get("page_num_int") else "?"
-
-                output += f"### {i}. [{doc_name}] (Page {page}, Score: {score:.2f})\n"
-                output += f"{content}...\n"
-                if keywords:
-                    output += f"**Keywords:** {', '.join(keywords[:5])}\n"
-                output += "\n"
-
-            return output
+        result = await fetch_es_hits(es_query)
+        return format_es_hits(result.get("hits", []), result.get("total", {}).get("value", 0))
 
     except httpx.HTTPStatusError as e:
         return f"HTTP Error: {e.response.status_code} - {e.response.text}"
@@ -918,173 +1398,163 @@ async def investigate(query: str, max_searches: int = 5, include_semantic: bool
         # Step 1: Parse the query to extract search terms
         query_lower = query.lower()
 
-        # Detect query intent
-        intent = "EXPLORE"
-        if any(kw in query_lower for kw in ["find", "prove", "evidence", "show", "support"]):
-            intent = "FIND_SUPPORT"
-        elif any(kw in query_lower for kw in ["contradict", "inconsisten", "conflict"]):
-            intent = "FIND_CONTRADICTION"
-        elif any(kw in query_lower for kw in ["timeline", "chronolog", "sequence", "when"]):
-            intent = "TIMELINE"
+        # Detect query intent (first matching intent wins)
+        intent = next(
+            (name for name, pattern in INTENT_PATTERNS if pattern.search(query_lower)),
+            "EXPLORE"
+        )
 
         # Extract potential entity names (capitalized words, known terms)
-        import re
-        import hashlib
-        potential_entities = re.findall(r'\b[A-Z][a-z]+(?:\s+[A-Z][a-z]+)*\b', query)
-
-        # Known system entities for this case
-        known_entities = {
-            "dmerx": ["dmerx", "dmrx"],
-            "healthsplash": ["healthsplash", "health splash", "splash"],
-            "blue mosaic": ["blue mosaic", "bluemosaic"],
-            "chris cirri": ["chris cirri", "cirri"],
-            "gary cox": ["gary cox", "cox"],
-            "brett blackman": ["brett blackman", "blackman"],
-        }
+        potential_entities = ENTITY_NAME_RE.findall(query)
 
-        # Match query against known entities
-        matched_entities = []
-        for entity, aliases in known_entities.items():
-            for alias in aliases:
-                if alias in query_lower:
-                    matched_entities.append((entity, aliases))
-                    break
+        # Match query against known entities (one pass, reported in table order)
+        hit_entities = {ENTITY_BY_ALIAS[m.group(1)] for m in ENTITY_ALIAS_RE.finditer(query_lower)}
+        matched_entities = [
+            (entity, aliases) for entity, aliases in KNOWN_ENTITIES.items()
+            if entity in hit_entities
+        ]
 
         # Extract topic keywords with alignment markers
         topic_keywords = []
-        supporting_keywords = []  # Keywords that support the thesis
         contradicting_keywords = []  # Keywords that contradict the thesis
 
-        topic_patterns = [
-            ("compliance", ["compliance", "compliant", "non-compliant"]),
-            ("302", ["302", "fbi", "interview"]),
-            ("feature", ["feature", "functionality", "refused", "wouldn't"]),
-            ("alternative", ["alternative", "own platform", "left", "switched"]),
-            ("doctor", ["doctor", "physician", "prescribe", "decline"]),
-            ("upset", ["upset", "frustrated", "complained", "unhappy"]),
-            ("satisfied", ["satisfied", "happy", "good customer", "stayed"]),
-        ]
-
-        for topic, patterns in topic_patterns:
-            for pattern in patterns:
-                if pattern in query_lower:
-                    topic_keywords.append(topic)
-                    # Mark as supporting evidence keywords
-                    supporting_keywords.extend(patterns)
-                    break
+        hit_topics = {TOPIC_BY_ALIAS[m.group(1)] for m in TOPIC_ALIAS_RE.finditer(query_lower)}
+        for topic, _patterns in TOPIC_PATTERNS:
+            if topic in hit_topics:
+                topic_keywords.append(topic)
 
         # If query asks about upset users, "good customer" is contradicting
         if "upset" in query_lower or "wouldn't" in query_lower or "refused" in query_lower:
             contradicting_keywords.extend(["good customer", "satisfied", "happy", "stayed"])
 
-        output = f"## Investigation: {query}\n\n"
-        output += f"**Intent:** {intent}\n"
-        output += f"**Detected Entities:** {', '.join([e[0] for e in matched_entities]) or 'None detected'}\n"
-        output += f"**Detected Topics:** {', '.join(topic_keywords) or 'General search'}\n"
+        parts = [f"## Investigation: {query}\n\n"]
+        parts.append(f"**Intent:** {intent}\n")
+        parts.append(f"**Detected Entities:** {', '.join([e[0] for e in matched_entities]) or 'None detected'}\n")
+        parts.append(f"**Detected Topics:** {', '.join(topic_keywords) or 'General search'}\n")
+        # Deduplicated in first-seen order, so the markers print deterministically
+        contradicting_keywords = list(dict.fromkeys(contradicting_keywords))
+        counter_markers = ", ".join(contradicting_keywords)
         if contradicting_keywords:
-            output += f"**Counter-Evidence Markers:** {', '.join(set(contradicting_keywords))}\n"
-        output += "\n---\n\n"
+            parts.append(f"**Counter-Evidence Markers:** {counter_markers}\n")
+        parts.append("\n---\n\n")
 
-        search_count = 0
         raw_result_count = 0
         duplicate_count = 0
 
         def hash_content(text: str) -> str:
             """Generate content hash for deduplication."""
-            normalized = text.lower().strip()[:200]
-            return hashlib.md5(normalized.encode()).hexdigest()[:12]
-
-        def check_alignment(text: str) -> tuple:
-            """Check if text supports or contradicts thesis."""
-            text_lower = text.lower()
-            supports = any(kw in text_lower for kw in supporting_keywords)
-            contradicts = any(kw in text_lower for kw in contradicting_keywords)
-            return supports, contradicts
-
-        # Step 2: Run entity-specific searches
+            normalized = text.strip()[:200].lower().encode()
+            if XXHASH_AVAILABLE:
+                return xxhash.xxh3_64_hexdigest(normalized)[:12]
+            return hashlib.md5(normalized).hexdigest()[:12]
+
+        # Steps 2-4: Plan entity, entity + topic boolean, and topic-only searches
+        # (in that priority order), capped at max_searches
+        planned = []  # (summary line, heading, build_es_query kwargs)
         for entity, aliases in matched_entities:
-            if search_count >= max_searches:
-                break
-
-            result = await search_elasticsearch(
-                query_type="match",
-                search_term=entity,
-                size=15
-            )
-            searches_run.append(f"Entity search: '{entity}'")
-            search_count += 1
-
-            if "No results found" not in result:
-                # Count results for dedup tracking
-                result_lines = result.count("**Document:**")
-                raw_result_count += result_lines
-                output += f"### Search: '{entity}'\n{result}\n"
-
-        # Step 3: Run entity + topic boolean searches
+            planned.append((
+                f"Entity search: '{entity}'", f"'{entity}'",
+                {"query_type": "match", "search_term": entity, "size": 15}
+            ))
         for entity, aliases in matched_entities:
             for topic in topic_keywords:
-                if search_count >= max_searches:
-                    break
+                planned.append((
+                    f"Boolean search: '{entity}' + '{topic}'", f"'{entity}' + '{topic}'",
+                    {
+                        "query_type": "bool",
+                        "must_terms": [entity],
+                        "should_terms": TOPIC_TERMS[topic],
+                        "size": 15
+                    }
+                ))
+        for topic in topic_keywords:
+            planned.append((
+                f"Topic search: '{topic}'", f"'{topic}'",
+                {"query_type": "match", "search_term": topic, "size": 10}
+            ))
+
+        # Drop searches identical to one already planned before applying the cap
+        seen_queries = set()
+        unique_planned = []
+        for item in planned:
+            kwargs = item[2]
+            query_key = (
+                kwargs["query_type"],
+                tuple(kwargs.get("must_terms") or ()),
+                tuple(kwargs.get("should_terms") or ()),
+                kwargs.get("search_term"),
+            )
+            if query_key not in seen_queries:
+                seen_queries.add(query_key)
+                unique_planned.append(item)
+        planned = unique_planned[:max_searches]
 
-                result = await search_elasticsearch(
-                    query_type="bool",
-                    must_terms=[entity],
-                    should_terms=[p for t, patterns in topic_patterns for p in patterns if t == topic],
-                    size=15
-                )
-                searches_run.append(f"Boolean search: '{entity}' + '{topic}'")
-                search_count += 1
+        # Step 5: Optionally include semantic search if we have capacity
+        run_semantic = include_semantic and len(planned) < max_searches
 
-                if "No results found" not in result:
-                    result_lines = result.count("**Document:**")
-                    raw_result_count += result_lines
-                    output += f"### Search: '{entity}' + '{topic}'\n{result}\n"
+        # Dispatch all searches concurrently; results come back in plan order
+        sem = asyncio.Semaphore(SEARCH_CONCURRENCY)
 
-        # Step 4: Run topic-only searches if we have capacity
-        for topic in topic_keywords:
-            if search_count >= max_searches:
-                break
+        async def bounded(coro):
+            async with sem:
+                return await coro
 
-            result = await search_elasticsearch(
-                query_type="match",
-                search_term=topic,
-                size=10
-            )
-            searches_run.append(f"Topic search: '{topic}'")
-            search_count += 1
+        searches = [bounded(fetch_es_hits(build_es_query(**kwargs))) for _, _, kwargs in planned]
+        if run_semantic:
+            searches.append(bounded(search_all_kbs(query=query, top_k=10)))
+        results = await asyncio.gather(*searches, return_exceptions=True)
 
-            if "No results found" not in result:
-                result_lines = result.count("**Document:**")
-                raw_result_count += result_lines
-                output += f"### Search: '{topic}'\n{result}\n"
+        for (summary, heading, _), result in zip(planned, results):
+            searches_run.append(summary)
 
-        # Step 5: Optionally include semantic search
-        if include_semantic and search_count < max_searches:
-            semantic_result = await search_all_kbs(query=query, top_k=10)
+            if isinstance(result, BaseException):
+                parts.append(f"### Search: {heading}\nError searching Elasticsearch: {str(result)}\n")
+                continue
+
+            # Keep only hits not already shown by an earlier search
+            unique_hits = []
+            for hit in result.get("hits", []):
+                source = hit.get("_source", {})
+                finding_key = (source.get("doc_id"), hash_content(source.get("content_with_weight", "")))
+                if finding_key in finding_hashes:
+                    duplicate_count += 1
+                    continue
+                finding_hashes.add(finding_key)
+                unique_hits.append(hit)
+
+            if unique_hits:
+                raw_result_count += len(unique_hits)
+                total = result.get("total", {}).get("value", 0)
+                parts.append(f"### Search: {heading}\n{format_es_hits(unique_hits, total)}\n")
+
+        if run_semantic:
+            semantic_result = results[-1]
             searches_run.append(f"Semantic search: '{query[:50]}...'")
 
             if "No results found" not in semantic_result:
                 result_lines = semantic_result.count("**Document:**")
                 raw_result_count += result_lines
-                output += f"### Semantic Search Results\n{semantic_result}\n"
+                parts.append(f"### Semantic Search Results\n{semantic_result}\n")
 
         # Summary with dedup stats
-        output += "---\n\n"
-        output += f"## Investigation Summary\n\n"
-        output += f"**Query Understanding:** {intent}\n"
-        output += f"**Searches Executed:** {len(searches_run)}\n"
-        output += f"**Results Found:** {raw_result_count}\n"
+        parts.append("---\n\n")
+        parts.append(f"## Investigation Summary\n\n")
+        parts.append(f"**Query Understanding:** {intent}\n")
+        parts.append(f"**Searches Executed:** {len(searches_run)}\n")
+        parts.append(f"**Results Found:** {raw_result_count}\n")
+        if duplicate_count:
+            parts.append(f"**Duplicates Skipped:** {duplicate_count}\n")
         for s in searches_run:
-            output += f"- {s}\n"
+            parts.append(f"- {s}\n")
 
         # Counter-evidence warning
         if contradicting_keywords:
-            output += f"\n**⚠️ Counter-Evidence Alert:** Findings containing '{', '.join(set(contradicting_keywords))}' may contradict the investigation thesis.\n"
+            parts.append(f"\n**⚠️ Counter-Evidence Alert:** Findings containing '{counter_markers}' may contradict the investigation thesis.\n")
 
-        output += f"\n**Note:** Review findings above for relevant evidence. "
-        output += f"Run additional `search_elasticsearch` queries to dive deeper into specific findings.\n"
+        parts.append(f"\n**Note:** Review findings above for relevant evidence. ")
+        parts.append(f"Run additional `search_elasticsearch` queries to dive deeper into specific findings.\n")
 
-        return output
+        return "".join(parts)
 
     except Exception as e:
         return f"Error during investigation: {str(e)}"
@@ -1129,52 +1599,53 @@ async def create_dataset(
             "permission": permission
         }
 
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            response = await client.post(
-                f"{RAGFLOW_BASE_URL}/datasets",
-                headers=get_headers(),
-                json=payload
-            )
-            response.raise_for_status()
-            data = response.json()
-
-            if data.get("code") != 0:
-                return json.dumps({
-                    "success": False,
-                    "error": data.get("message", "Unknown error"),
-                    "rationale": rationale
-                })
+        response = await ragflow_request(
+            "POST", "/datasets",
+            headers=get_headers(),
+            content=orjson.dumps(payload)
+        )
+        response.raise_for_status()
+        data = orjson.loads(response.content)
 
-            dataset_info = data.get("data", {})
-            dataset_id = dataset_info.get("id", "unknown")
-
-            return json.dumps({
-                "success": True,
-                "dataset_id": dataset_id,
-                "name": name,
-                "embedding_model": embedding_model,
-                "chunk_method": chunk_method,
-                "chunk_token_num": chunk_token_num,
-                "graphrag_enabled": enable_graphrag,
-                "rationale": rationale,
-                "message": f"Knowledge base '{name}' created successfully. Ready for document upload.",
-                "next_steps": [
-                    f"Upload documents: upload_document(dataset_id='{dataset_id}', ...)",
-                    "Documents will be automatically chunked and embedded",
-                    "Use search_knowledge_base to query once processing completes"
-                ]
-            })
+        if data.get("code") != 0:
+            return orjson.dumps({
+                "success": False,
+                "error": data.get("message", "Unknown error"),
+                "rationale": rationale
+            }).decode()
+
+        _invalidate_caches()
+
+        dataset_info = data.get("data", {})
+        dataset_id = dataset_info.get("id", "unknown")
+
+        return orjson.dumps({
+            "success": True,
+            "dataset_id": dataset_id,
+            "name": name,
+            "embedding_model": embedding_model,
+            "chunk_method": chunk_method,
+            "chunk_token_num": chunk_token_num,
+            "graphrag_enabled": enable_graphrag,
+            "rationale": rationale,
+            "message": f"Knowledge base '{name}' created successfully. Ready for document upload.",
+            "next_steps": [
+                f"Upload documents: upload_document(dataset_id='{dataset_id}', ...)",
+                "Documents will be automatically chunked and embedded",
+                "Use search_knowledge_base to query once processing completes"
+            ]
+        }).decode()
 
     except httpx.HTTPStatusError as e:
-        return json.dumps({
+        return orjson.dumps({
             "success": False,
             "error": f"HTTP {e.response.status_code}: {e.response.text}"
-        })
+        }).decode()
     except Exception as e:
-        return json.dumps({
+        return orjson.dumps({
             "success": False,
             "error": str(e)
-        })
+        }).decode()
 
 
 async def update_dataset(
@@ -1189,66 +1660,119 @@ async def update_dataset(
     """Update an existing knowledge base configuration."""
     try:
         # Build update payload with only provided fields
-        payload = {}
-        if name is not None:
-            payload["name"] = name
-        if description is not None:
-            payload["description"] = description
-        if embedding_model is not None:
-            payload["embedding_model"] = embedding_model
-        if chunk_method is not None:
-            payload["chunk_method"] = chunk_method
-        if chunk_token_num is not None:
-            payload["parser_config"] = {"chunk_token_num": chunk_token_num}
-        if permission is not None:
-            payload["permission"] = permission
+        fields = {
+            "name": name,
+            "description": description,
+            "embedding_model": embedding_model,
+            "chunk_method": chunk_method,
+            "parser_config": {"chunk_token_num": chunk_token_num} if chunk_token_num is not None else None,
+            "permission": permission,
+        }
+        payload = {key: value for key, value in fields.items() if value is not None}
 
         if not payload:
-            return json.dumps({
+            return orjson.dumps({
                 "success": False,
                 "error": "No update fields provided"
-            })
+            }).decode()
 
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            response = await client.put(
-                f"{RAGFLOW_BASE_URL}/datasets/{dataset_id}",
-                headers=get_headers(),
-                json=payload
-            )
-            response.raise_for_status()
-            data = response.json()
+        response = await ragflow_request(
+            "PUT", f"/datasets/{dataset_id}",
+            headers=get_headers(),
+            content=orjson.dumps(payload)
+        )
+        response.raise_for_status()
+        data = orjson.loads(response.content)
 
-            if data.get("code") != 0:
-                return json.dumps({
-                    "success": False,
-                    "error": data.get("message", "Unknown error")
-                })
+        if data.get("code") != 0:
+            return orjson.dumps({
+                "success": False,
+                "error": data.get("message", "Unknown error")
+            }).decode()
 
-            return json.dumps({
-                "success": True,
-                "dataset_id": dataset_id,
-                "updated_fields": list(payload.keys()),
-                "message": "Knowledge base updated successfully",
-                "warning": "If embedding_model changed, existing documents need re-indexing"
-            })
+        _invalidate_caches()
+        KB_VECTOR_CACHE.pop(dataset_id, None)
+
+        return orjson.dumps({
+            "success": True,
+            "dataset_id": dataset_id,
+            "updated_fields": list(payload.keys()),
+            "message": "Knowledge base updated successfully",
+            "warning": "If embedding_model changed, existing documents need re-indexing"
+        }).decode()
 
     except Exception as e:
-        return json.dumps({
+        return orjson.dumps({
             "success": False,
             "error": str(e)
-        })
+        }).decode()
 
 
 # NOTE: delete_dataset function intentionally REMOVED
 # Legal evidence systems must preserve all data - deletion only via admin UI with audit trail
 
 
+# KB overlap: term-frequency vectors over name + description. Words that name
+# almost every KB carry no signal and are dropped.
+OVERLAP_STOPWORDS = frozenset({"a", "an", "and", "the", "of", "for", "kb", "knowledge", "base"})
+OVERLAP_SIMILARITY_THRESHOLD = 0.3
+_TERM_RE = re.compile(r"[a-z0-9]+")
+
+# dataset id -> (source text, term vector); entries are rebuilt when the text changes
+KB_VECTOR_CACHE: Dict[str, tuple] = {}
+
+
+def term_vector(text: str) -> Dict[str, float]:
+    """Unit-length term-frequency vector for text (underscores split words)."""
+    counts: Dict[str, float] = defaultdict(float)
+    for term in _TERM_RE.findall(text.lower().replace("_", " ")):
+        if term not in OVERLAP_STOPWORDS:
+            counts[term] += 1.0
+    norm = sum(v * v for v in counts.values()) ** 0.5
+    return {t: v / norm for t, v in counts.items()} if norm else {}
+
+
+def cosine_similarity(a: Dict[str, float], b: Dict[str, float]) -> float:
+    """Dot product of two unit-length sparse vectors."""
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(v * b.get(t, 0.0) for t, v in a.items())
+
+
+def kb_term_vector(kb: dict) -> Dict[str, float]:
+    """Cached term vector for a dataset's name + description."""
+    text = f"{kb.get('name') or ''} {kb.get('description') or ''}"
+    cached = KB_VECTOR_CACHE.get(kb.get("id"))
+    if cached is not None and cached[0] == text:
+        return cached[1]
+    vector = term_vector(text)
+    KB_VECTOR_CACHE[kb.get("id")] = (text, vector)
+    return vector
+
+
+# Document type keyword -> recommended chunk method; earlier keys take priority
+SPECIALIZED_METHODS = {
+    "302s": "laws",
+    "fbi": "laws",
+    "legal": "laws",
+    "email": "email",
+    "communication": "email",
+    "technical": "manual",
+    "manual": "manual",
+    "academic": "paper",
+    "research": "paper",
+    "financial": "table",
+    "spreadsheet": "table"
+}
+
+
 async def analyze_kb_need(
     proposed_name: str,
     domain: str,
     document_types: List[str] = None,
     sample_queries: List[str] = None,
-    test_existing_kbs: bool = True
+    test_existing_kbs: bool = True,
+    pretty: bool = False
 ) -> str:
     """ARE-based self-reasoning to determine if a new KB should be created.
 
@@ -1273,20 +1797,30 @@ async def analyze_kb_need(
             "rationale": ""
         }
 
-        # Factor 1: Check existing KBs for domain overlap
-        existing_kbs = await list_datasets(page=1, page_size=100)
+        # The KB listing and the sample-query probes (Factor 3) are independent,
+        # so fetch them all concurrently
+        probe_queries = sample_queries[:3] if test_existing_kbs and sample_queries else []  # Limit to 3 queries
+        datasets_data, *probe_results = await asyncio.gather(
+            fetch_datasets({"page": 1, "page_size": 100}),
+            *(search_all_kbs_raw(query=query, top_k=3, similarity_threshold=0.3) for query in probe_queries),
+            return_exceptions=True
+        )
+        # An unreachable listing just means no known overlap
+        if isinstance(datasets_data, BaseException) or datasets_data.get("code") != 0:
+            existing_kbs = []
+        else:
+            existing_kbs = datasets_data.get("data", [])
 
-        domain_keywords = domain.lower().split("_") + [domain.lower()]
+        # Factor 1: Check existing KBs for domain overlap (cosine similarity of
+        # the proposal's terms against each KB's name + description)
+        proposal_vec = term_vector(f"{proposed_name} {domain}")
         overlap_score = 0.0
 
-        # Parse existing KBs (they come as formatted string)
-        if "Knowledge Bases" in existing_kbs:
-            lines = existing_kbs.split("\n")
-            for line in lines:
-                for kw in domain_keywords:
-                    if kw in line.lower():
-                        overlap_score += 0.2
-                        analysis["existing_kb_overlap"].append(line.strip())
+        for kb in existing_kbs:
+            similarity = cosine_similarity(proposal_vec, kb_term_vector(kb))
+            if similarity >= OVERLAP_SIMILARITY_THRESHOLD:
+                overlap_score += similarity
+                analysis["existing_kb_overlap"].append(kb.get("name", "Unknown"))
 
         analysis["factors"].append({
             "name": "domain_overlap",
@@ -1295,26 +1829,12 @@ async def analyze_kb_need(
         })
 
         # Factor 2: Document type specialization
-        specialized_methods = {
-            "302s": "laws",
-            "fbi": "laws",
-            "legal": "laws",
-            "email": "email",
-            "communication": "email",
-            "technical": "manual",
-            "manual": "manual",
-            "academic": "paper",
-            "research": "paper",
-            "financial": "table",
-            "spreadsheet": "table"
-        }
-
         recommended_method = "naive"
         doc_type_score = 0.0
 
         for doc_type in (document_types or []):
             doc_lower = doc_type.lower()
-            for key, method in specialized_methods.items():
+            for key, method in SPECIALIZED_METHODS.items():
                 if key in doc_lower:
                     recommended_method = method
                     doc_type_score += 0.3
@@ -1329,25 +1849,27 @@ async def analyze_kb_need(
 
         # Factor 3: Test sample queries against existing KBs
         query_performance = []
-        if test_existing_kbs and sample_queries:
-            for query in sample_queries[:3]:  # Limit to 3 queries
-                try:
-                    result = await search_all_kbs(query=query, top_k=3, similarity_threshold=0.3)
-                    has_results = "No results found" not in result
-                    high_quality = "Score: 0.7" in result or "Score: 0.8" in result or "Score: 0.9" in result
-
-                    query_performance.append({
-                        "query": query,
-                        "found_results": has_results,
-                        "high_quality": high_quality
-                    })
-                except:
+        if probe_queries:
+            for query, result in zip(probe_queries, probe_results):
+                # Every KB failing is an error, not "no results"
+                if isinstance(result, BaseException) or (result[2] and not result[1]):
                     query_performance.append({
                         "query": query,
                         "found_results": False,
                         "high_quality": False,
                         "error": True
                     })
+                    continue
+
+                _, hits, _ = result
+                has_results = bool(hits)
+                high_quality = any(chunk.get("similarity", 0) >= 0.7 for _, _, chunk in hits)
+
+                query_performance.append({
+                    "query": query,
+                    "found_results": has_results,
+                    "high_quality": high_quality
+                })
 
             analysis["test_results"] = query_performance
 
@@ -1414,15 +1936,16 @@ async def analyze_kb_need(
                 "embedding_model": "voyage-law-2@VoyageAI" if "legal" in domain.lower() else "BAAI/bge-large-zh-v1.5@Xinference"
             }
 
-        return json.dumps(analysis, indent=2)
+        # Compact by default: the result is parsed by the MCP client, not read
+        return orjson.dumps(analysis, option=orjson.OPT_INDENT_2 if pretty else 0).decode()
 
     except Exception as e:
-        return json.dumps({
+        return orjson.dumps({
             "success": False,
             "error": str(e),
             "recommendation": "ERROR",
             "confidence": 0.0
-        })
+        }).decode()
 
 
 # Tool dispatcher
@@ -1444,6 +1967,13 @@ TOOL_HANDLERS = {
     "analyze_kb_need": analyze_kb_need,
 }
 
+# Tools whose responses may be served from RESPONSE_CACHE: everything but
+# writes, and the document tools clients poll for parse status/progress
+READ_ONLY_TOOLS = frozenset(TOOL_HANDLERS) - {
+    "upload_document", "create_dataset", "update_dataset",
+    "get_document", "list_documents",
+}
+
 
 # ============================================================================
 # MCP Protocol Handlers
@@ -1466,24 +1996,30 @@ async def handle_mcp_request(data: dict, session_id: str = None) -> dict:
             }
         }
     elif method == "tools/list":
+        # "_raw_result" holds pre-serialized JSON; see encode_response()
         return {
             "jsonrpc": "2.0",
             "id": request_id,
-            "result": {"tools": TOOLS}
+            "_raw_result": TOOLS_LIST_RESULT
         }
     elif method == "tools/call":
         tool_name = params.get("name")
         arguments = params.get("arguments", {})
 
-        if tool_name not in TOOL_HANDLERS:
+        handler = TOOL_HANDLERS.get(tool_name)
+        if handler is None:
             return {
                 "jsonrpc": "2.0",
                 "id": request_id,
                 "error": {"code": -32601, "message": f"Unknown tool: {tool_name}"}
             }
 
-        handler = TOOL_HANDLERS[tool_name]
-        result = await handler(**arguments)
+        cache_key = _request_key(tool_name, arguments) if tool_name in READ_ONLY_TOOLS else None
+        result = RESPONSE_CACHE.get(cache_key) if cache_key else None
+        if result is None:
+            result = await handler(**arguments)
+            if cache_key and _cacheable(result):
+                RESPONSE_CACHE.put(cache_key, result)
 
         return {
             "jsonrpc": "2.0",
@@ -1501,6 +2037,14 @@ async def handle_mcp_request(data: dict, session_id: str = None) -> dict:
         }
 
 
+def encode_response(response_data: dict) -> bytes:
+    """Serialize a JSON-RPC response, splicing in a pre-serialized "_raw_result"."""
+    raw_result = response_data.get("_raw_result")
+    if raw_result is None:
+        return orjson.dumps(response_data)
+    return b'{"jsonrpc":"2.0","id":' + orjson.dumps(response_data.get("id")) + b',"result":' + raw_result + b'}'
+
+
 # ============================================================================
 # HTTP+SSE Endpoints (MCP Protocol 2024-11-05)
 # ============================================================================
@@ -1542,46 +2086,86 @@ async def handle_sse_get(request):
     )
     await response.prepare(request)
 
+    closed = asyncio.Event()
     SSE_SESSIONS[session_id] = response
+    SSE_CLOSED[session_id] = closed
 
     try:
         endpoint_url = f"/sse?session_id={session_id}"
         await response.write(f"event: endpoint\ndata: {endpoint_url}\n\n".encode())
 
-        while True:
-            await asyncio.sleep(30)
-            try:
-                await response.write(f": ping\n\n".encode())
-            except:
-                break
+        # Held open until the keepalive loop sees the client disconnect
+        await closed.wait()
 
     except asyncio.CancelledError:
         pass
     finally:
         SSE_SESSIONS.pop(session_id, None)
+        SSE_CLOSED.pop(session_id, None)
 
     return response
 
 
+async def _ping_session(session_id: str, response):
+    """Write one keepalive comment; mark the session closed if the write fails.
+
+    A client that stops reading makes write() wait on drain() indefinitely, so
+    the write is bounded by the ping interval and a stalled session is treated
+    as gone rather than holding up every other session's ping.
+    """
+    try:
+        await asyncio.wait_for(response.write(b": ping\n\n"), SSE_PING_INTERVAL)
+    except Exception:
+        closed = SSE_CLOSED.get(session_id)
+        if closed is not None:
+            closed.set()
+
+
+async def keepalive_loop():
+    """Ping all open SSE sessions every SSE_PING_INTERVAL seconds."""
+    while True:
+        await asyncio.sleep(SSE_PING_INTERVAL)
+        if SSE_SESSIONS:
+            await asyncio.gather(*(
+                _ping_session(session_id, response)
+                for session_id, response in list(SSE_SESSIONS.items())
+            ))
+
+
+async def start_keepalive(app=None):
+    """Start the shared keepalive task (registered as an aiohttp startup hook)."""
+    global _KEEPALIVE_TASK
+    if _KEEPALIVE_TASK is None or _KEEPALIVE_TASK.done():
+        _KEEPALIVE_TASK = asyncio.create_task(keepalive_loop())
+
+
+async def stop_keepalive(app=None):
+    """Cancel the keepalive task and release any sessions still waiting on it."""
+    global _KEEPALIVE_TASK
+    if _KEEPALIVE_TASK is not None:
+        _KEEPALIVE_TASK.cancel()
+        _KEEPALIVE_TASK = None
+    for closed in list(SSE_CLOSED.values()):
+        closed.set()
+
+
 async def handle_sse_post(request):
     """Handle POST to /sse for MCP SSE transport."""
     if not verify_auth(request):
         return web.json_response({"error": "Unauthorized"}, status=401)
 
     try:
-        data = await request.json()
+        data = orjson.loads(await request.read())
         session_id = request.query.get("session_id")
 
         response_data = await handle_mcp_request(data, session_id)
+        sse_response = SSE_SESSIONS.get(session_id) if session_id else None
 
-        if response_data and session_id and session_id in SSE_SESSIONS:
-            sse_response = SSE_SESSIONS.get(session_id)
-            if sse_response:
-                msg = json.dumps(response_data)
-                await sse_response.write(f"event: message\ndata: {msg}\n\n".encode())
+        if response_data and sse_response is not None:
+            await sse_response.write(b"event: message\ndata: " + encode_response(response_data) + b"\n\n")
             return web.Response(status=202)
         elif response_data:
-            return web.json_response(response_data)
+            return web.Response(body=encode_response(response_data), content_type="application/json")
         else:
             return web.Response(status=202)
 
@@ -1605,19 +2189,20 @@ async def handle_sse(request):
 async def handle_messages(request):
     """Handle POST messages from MCP client."""
     session_id = request.query.get("session_id")
+    sse_response = SSE_SESSIONS.get(session_id) if session_id else None
 
-    if not session_id or session_id not in SSE_SESSIONS:
+    if sse_response is None:
         return web.json_response({"error": "Invalid or expired session"}, status=400)
 
     try:
-        data = await request.json()
+        data = orjson.loads(await request.read())
         response_data = await handle_mcp_request(data, session_id)
 
         if response_data:
+            # Re-read: the stream may have closed while the tool ran
             sse_response = SSE_SESSIONS.get(session_id)
-            if sse_response:
-                msg = json.dumps(response_data)
-                await sse_response.write(f"event: message\ndata: {msg}\n\n".encode())
+            if sse_response is not None:
+                await sse_response.write(b"event: message\ndata: " + encode_response(response_data) + b"\n\n")
 
         return web.Response(status=202)
 
@@ -1625,16 +2210,20 @@ async def handle_messages(request):
         return web.json_response({"error": str(e)}, status=500)
 
 
+# Health fields that never change after startup
+HEALTH_STATIC = {
+    "status": "healthy",
+    "service": "ragflow-mcp",
+    "tools": len(TOOLS),
+    "ragflow_url": RAGFLOW_BASE_URL,
+    "api_token_configured": bool(API_TOKEN),
+}
+
+
 async def handle_health(request):
     """Health check endpoint."""
-    return web.json_response({
-        "status": "healthy",
-        "service": "ragflow-mcp",
-        "tools": len(TOOLS),
-        "ragflow_url": RAGFLOW_BASE_URL,
-        "api_token_configured": bool(API_TOKEN),
-        "active_sessions": len(SSE_SESSIONS)
-    })
+    payload = {**HEALTH_STATIC, "active_sessions": len(SSE_SESSIONS)}
+    return web.Response(body=orjson.dumps(payload), content_type="application/json")
 
 
 async def handle_cors_preflight(request):
@@ -1671,10 +2260,23 @@ def create_app():
     app.router.add_options("/messages", handle_cors_preflight)
     app.router.add_get("/health", handle_health)
 
+    app.on_startup.append(open_clients)
+    app.on_startup.append(start_keepalive)
+    app.on_shutdown.append(stop_keepalive)
+    app.on_cleanup.append(close_clients)
+
     return app
 
 
 if __name__ == "__main__":
+    # uvloop replaces the default selector loop with libuv; optional so the
+    # server still starts on platforms without it (e.g. Windows dev boxes)
+    try:
+        import uvloop
+        uvloop.install()
+    except ImportError:
+        pass
+
     print("=" * 60)
     print("RAGFlow MCP Server (SSE Transport)")
     print("=" * 60)
@@ -1689,4 +2291,5 @@ if __name__ == "__main__":
     print("=" * 60)
 
     app = create_app()
-    web.run_app(app, host="0.0.0.0", port=SERVER_PORT)
+    # access_log=None skips per-request log formatting on the hot path
+    web.run_app(app, host="0.0.0.0", port=SERVER_PORT, access_log=None)
@@ -22,6 +22,7 @@ Tools:
 - add_brady_item: Add Brady material to report
 - add_timeline_event: Add event to timeline
 - add_citation: Add verified citation
+- add_batch: Add many items in one call
 - export_markdown: Export as .md file
 - export_pdf: Export as PDF
 - export_docx: Export as Word document
@@ -30,28 +31,207 @@ Tools:
 """
 
 import os
-import json
+import io
+import re
+import gzip
+import hmac
+import logging
+import hashlib
+import inspect
 import asyncio
+import socket
 import uuid
-from typing import Optional, Dict, Any, List
+import zlib
+import weakref
+import multiprocessing
+from collections import OrderedDict, defaultdict, deque
+from bisect import bisect_right
+from operator import attrgetter
+from dataclasses import dataclass, field, fields
+from typing import Optional, Dict, Any, List, Set, TextIO, BinaryIO
 from datetime import datetime
+from contextvars import ContextVar
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+import orjson
 from aiohttp import web
 
+# In-process PDF rendering (markdown -> HTML -> PDF); pandoc is the fallback
+try:
+    import markdown
+    from weasyprint import HTML, CSS
+    WEASYPRINT_AVAILABLE = True
+except (ImportError, OSError):  # OSError: Pango/cairo system libraries missing
+    WEASYPRINT_AVAILABLE = False
+
 # Configuration
+logger = logging.getLogger("report-writer")
+
 SERVER_PORT = int(os.environ.get("MCP_SERVER_PORT", "3015"))
 AUTH_TOKEN = os.environ.get("MCP_AUTH_TOKEN", "")
+AUTH_TOKEN_BYTES = AUTH_TOKEN.encode()
+_BEARER_PREFIX = "Bearer "
+_BEARER_LEN = len(_BEARER_PREFIX)
+# Only an Authorization header of exactly this length can hold the token
+_BEARER_HEADER_LEN = _BEARER_LEN + len(AUTH_TOKEN)
 REPORTS_DIR = Path(os.environ.get("REPORTS_OUTPUT_DIR", "/data/reports"))
 TEMPLATES_DIR = Path(os.environ.get("TEMPLATES_DIR", "/templates"))
+# gzip level for compressed exports: 4 keeps most of the ratio at a fraction of level 9's CPU
+GZIP_LEVEL = 4
+# "weasyprint" (default, when installed) or "pandoc" to force pandoc + xelatex
+PDF_ENGINE = os.environ.get("PDF_ENGINE", "weasyprint")
+
+# Default PDF stylesheet; TEMPLATES_DIR/report.css replaces it when present
+PDF_CSS = """
+@page { size: Letter; margin: 1in; }
+body { font-family: "DejaVu Serif", serif; font-size: 11pt; line-height: 1.4; }
+h1 { text-align: center; }
+table { border-collapse: collapse; width: 100%; }
+th, td { border: 1px solid #999; padding: 4px 6px; font-size: 10pt; }
+blockquote { margin-left: 0; padding-left: 1em; border-left: 3px solid #ccc; }
+"""
 
 # Ensure directories exist
 REPORTS_DIR.mkdir(parents=True, exist_ok=True)
+# Directories already created by this process (case dirs under REPORTS_DIR, export targets)
+_CREATED_DIRS: Set[Path] = {REPORTS_DIR}
 
-# Store active SSE sessions
-SSE_SESSIONS: Dict[str, Any] = {}
 
-# In-memory report storage (would be persisted to PostgreSQL in production)
-REPORTS: Dict[str, Dict] = {}
+# ============================================================================
+# Report Model
+# ============================================================================
+
+@dataclass(slots=True)
+class Section:
+    id: str
+    heading: str
+    content: str
+    level: int = 2
+
+
+@dataclass(slots=True)
+class Finding:
+    id: str
+    finding: str
+    sources: List[str]
+    confidence: str = "MEDIUM"
+
+
+@dataclass(slots=True)
+class Contradiction:
+    id: str
+    source1: dict  # {doc, quote}
+    source2: dict
+    description: str
+    severity: str = "MEDIUM"
+
+
+@dataclass(slots=True)
+class BradyItem:
+    id: str
+    type: str  # exculpatory, impeachment, deal, coercion
+    description: str
+    sources: List[str]
+    priority: str = "MEDIUM"
+
+
+@dataclass(slots=True)
+class TimelineEvent:
+    id: str
+    date: str
+    event: str
+    source: Optional[str]
+    actors: List[str]
+
+
+@dataclass(slots=True)
+class Citation:
+    id: str
+    citation: str
+    context: str
+    verified: bool = True
+
+
+@dataclass(slots=True)
+class Report:
+    """An investigation report. Item lists are named as in the add_batch schema."""
+    id: str
+    case_id: str
+    type: str
+    title: str
+    created_at: str
+    updated_at: str
+    slug: str  # filename stem for exports, from the title
+    sections: List[Section] = field(default_factory=list)
+    findings: List[Finding] = field(default_factory=list)
+    contradictions: List[Contradiction] = field(default_factory=list)
+    brady_items: List[BradyItem] = field(default_factory=list)
+    timeline: List[TimelineEvent] = field(default_factory=list)
+    citations: List[Citation] = field(default_factory=list)
+    # (updated_at, UTF-8 markdown) from the last render; see _get_markdown
+    md_cache: Optional[tuple] = None
+
+
+# Report fields written to the journal's create record (md_cache is a render cache)
+_RECORD_FIELDS = tuple(f.name for f in fields(Report) if f.name != "md_cache")
+
+# Report list attribute -> item class, for rebuilding items from the journal
+ITEM_TYPES = {
+    "sections": Section,
+    "findings": Finding,
+    "contradictions": Contradiction,
+    "brady_items": BradyItem,
+    "timeline": TimelineEvent,
+    "citations": Citation,
+}
+
+# Active SSE sessions: session_id -> queue of encoded frames for that
+# session's writer (the GET handler). The queue bounds what a slow client can
+# buffer; a POST that can't enqueue within SSE_PUT_TIMEOUT closes the session.
+# Values are weak: the writer holds the only strong reference, so an entry
+# disappears with its writer even if the explicit cleanup is skipped.
+SSE_SESSIONS: "weakref.WeakValueDictionary[str, asyncio.Queue]" = weakref.WeakValueDictionary()
+SSE_MAX_QUEUE_SIZE = int(os.environ.get("SSE_MAX_QUEUE_SIZE", "1000"))
+SSE_PUT_TIMEOUT = 5.0
+# One keepalive task pings every open session on a shared interval, skipping
+# sessions in SSE_ACTIVE (those that sent an event since the last tick)
+SSE_PING_INTERVAL = int(os.environ.get("SSE_PING_INTERVAL", "30"))
+SSE_ACTIVE: Set[str] = set()
+# Pre-encoded SSE framing
+PING_BYTES = b": ping\n\n"
+EVENT_PREFIX = b"event: message\ndata: "
+EVENT_SUFFIX = b"\n\n"
+SSE_RETRY_MS = 3000
+ENDPOINT_TMPL = b"retry: %d\nevent: endpoint\ndata: /sse?session_id=%%b\n\n" % SSE_RETRY_MS
+EVENT_ID_TMPL = b"id: %b-%d\n"
+_KEEPALIVE_TASK: Optional[asyncio.Task] = None
+# gzip the SSE stream for clients that accept it; set SSE_GZIP=0 behind
+# intermediaries that buffer compressed responses
+SSE_GZIP = os.environ.get("SSE_GZIP", "1") != "0"
+# session_id -> ring of recent (event number, frame) pairs. Events carry
+# "<session_id>-<n>" IDs, so a client reconnecting with Last-Event-ID resumes
+# its session and gets what it missed. Rings outlive their connection; only the
+# SSE_HISTORY_MAX most recently opened sessions are kept.
+SSE_REPLAY_SIZE = int(os.environ.get("SSE_REPLAY_SIZE", "64"))
+SSE_HISTORY_MAX = int(os.environ.get("SSE_HISTORY_MAX", "256"))
+SSE_HISTORY: "OrderedDict[str, deque]" = OrderedDict()
+
+# Reports are journaled to <case dir>/<report_id>.jsonl (see _case_dir). Only
+# the most recently used REPORT_CACHE_MAX are kept in memory (LRU order);
+# others are rebuilt from their journal on next access.
+REPORT_CACHE_MAX = int(os.environ.get("REPORT_CACHE_MAX", "512"))
+REPORTS: "OrderedDict[str, Report]" = OrderedDict()
+# report_id -> journal path for every journaled report, in memory or not
+REPORT_JOURNALS: Dict[str, Path] = {}
+# Open append handles for recently written journals, so a mutation is a
+# write + flush rather than an open/append/close on the event loop
+JOURNAL_HANDLES_MAX = 64
+_JOURNAL_HANDLES: "OrderedDict[Path, BinaryIO]" = OrderedDict()
+# case_id -> report IDs, so list_reports doesn't scan every case
+REPORTS_BY_CASE: Dict[str, List[str]] = defaultdict(list)
+
+# ISO timestamp of the tools/call being handled; every mutation in one call shares it
+_REQUEST_TS: ContextVar[Optional[str]] = ContextVar("request_ts", default=None)
 
 
 # Tool definitions for MCP
@@ -162,6 +342,23 @@ TOOLS = [
             "required": ["report_id", "citation", "context"]
         }
     },
+    {
+        "name": "add_batch",
+        "description": "Add several sections, findings, contradictions, Brady items, timeline events and citations to a report in one call. Each item takes the same fields as the matching add_* tool, without report_id.",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "report_id": {"type": "string", "description": "Report ID"},
+                "sections": {"type": "array", "items": {"type": "object"}, "description": "Sections {heading, content, level}"},
+                "findings": {"type": "array", "items": {"type": "object"}, "description": "Findings {finding, sources, confidence}"},
+                "contradictions": {"type": "array", "items": {"type": "object"}, "description": "Contradictions {source1, source2, description, severity}"},
+                "brady_items": {"type": "array", "items": {"type": "object"}, "description": "Brady items {item_type, description, sources, priority}"},
+                "timeline": {"type": "array", "items": {"type": "object"}, "description": "Timeline events {date, event, source, actors}"},
+                "citations": {"type": "array", "items": {"type": "object"}, "description": "Citations {citation, context, verified}"}
+            },
+            "required": ["report_id"]
+        }
+    },
     {
         "name": "export_markdown",
         "description": "Export report as Markdown file.",
@@ -169,7 +366,8 @@ TOOLS = [
             "type": "object",
             "properties": {
                 "report_id": {"type": "string", "description": "Report ID"},
-                "output_path": {"type": "string", "description": "Optional output path (defaults to reports dir)"}
+                "output_path": {"type": "string", "description": "Optional output path (defaults to reports dir)"},
+                "compress": {"type": "boolean", "description": "Write gzip-compressed .md.gz instead of .md", "default": False}
             },
             "required": ["report_id"]
         }
@@ -222,46 +420,232 @@ TOOLS = [
     }
 ]
 
+# TOOLS never changes, so the tools/list result is serialized once
+TOOLS_LIST_RESULT = orjson.dumps({"tools": TOOLS})
+
 
 # ============================================================================
 # Tool Implementations
 # ============================================================================
 
+def _new_id() -> str:
+    """Short random ID for reports and report items (8 hex chars)."""
+    return os.urandom(4).hex()
+
+
+def _now() -> str:
+    """ISO timestamp for the current tool call (computed once per call by handle_mcp_request)."""
+    return _REQUEST_TS.get() or datetime.utcnow().isoformat()
+
+
+# Anything but letters, digits, "_", "-" and space (\w is Unicode-aware, like str.isalnum)
+_SLUG_STRIP_RE = re.compile(r"[^\w\- ]+")
+# Case IDs that are safe to use directly as a directory name
+_CASE_DIR_RE = re.compile(r"[A-Za-z0-9][\w.\-]*")
+
+
+def _slugify(title: str) -> str:
+    """Filename-safe stem for a report title (computed once, at creation)."""
+    return _SLUG_STRIP_RE.sub("", title).replace(" ", "-").lower()[:50]
+
+
+def _ensure_dir(path: Path) -> None:
+    """mkdir -p, skipped for directories this process has already created."""
+    if path not in _CREATED_DIRS:
+        path.mkdir(parents=True, exist_ok=True)
+        _CREATED_DIRS.add(path)
+
+
+async def _ensure_dir_async(path: Path) -> None:
+    """_ensure_dir for the export tools: only a first-time mkdir goes to a thread."""
+    if path not in _CREATED_DIRS:
+        await asyncio.to_thread(_ensure_dir, path)
+
+
+def _case_dir(case_id: str) -> Path:
+    """Directory for a case's journals and exports.
+
+    Plain case IDs are used as-is; anything else (spaces, leading dots,
+    non-filename characters, empty) gets a slug plus a hash so it stays one directory
+    inside REPORTS_DIR.
+    """
+    if _CASE_DIR_RE.fullmatch(case_id):
+        return REPORTS_DIR / case_id
+    digest = hashlib.sha1(case_id.encode("utf-8", "surrogatepass")).hexdigest()[:10]
+    return REPORTS_DIR / f"{_slugify(case_id)[:40] or 'case'}-{digest}"
+
+
+def _journal_path(report: Report) -> Path:
+    """Journal file for a report, kept next to its exports."""
+    path = REPORT_JOURNALS.get(report.id)
+    if path is None:
+        path = REPORT_JOURNALS[report.id] = _case_dir(report.case_id) / f"{report.id}.jsonl"
+    return path
+
+
+def _open_journal(path: Path) -> BinaryIO:
+    """Append handle for a journal, kept open for the JOURNAL_HANDLES_MAX most recent."""
+    f = _JOURNAL_HANDLES.get(path)
+    if f is not None:
+        _JOURNAL_HANDLES.move_to_end(path)
+        return f
+    _ensure_dir(path.parent)
+    f = path.open("a+b")
+    # An interrupted append leaves a last line without "\n"; end it so the next
+    # entry starts on its own line instead of being glued onto the torn one
+    if f.seek(0, io.SEEK_END):
+        f.seek(-1, io.SEEK_END)
+        if f.read(1) != b"\n":
+            f.write(b"\n")
+    _JOURNAL_HANDLES[path] = f
+    while len(_JOURNAL_HANDLES) > JOURNAL_HANDLES_MAX:
+        _JOURNAL_HANDLES.popitem(last=False)[1].close()
+    return f
+
+
+def _journal(report: Report, entry: dict) -> None:
+    """Append one change to the report's JSONL journal (one line per tool call)."""
+    path = _journal_path(report)
+    f = _open_journal(path)
+    try:
+        f.write(orjson.dumps(entry) + b"\n")
+        f.flush()
+    except OSError:
+        # Drop the handle so the next append reopens and repairs the tail
+        _JOURNAL_HANDLES.pop(path, None)
+        f.close()
+        raise
+
+
+async def close_journals(app=None):
+    """Close cached journal handles (registered as an aiohttp cleanup hook)."""
+    while _JOURNAL_HANDLES:
+        _JOURNAL_HANDLES.popitem()[1].close()
+
+
+def _apply_items(report: Report, items: Dict[str, list], ts: str) -> None:
+    """Add items to a report in memory (used by the add_* tools and journal replay).
+
+    The timeline is ordered before anything changes, so dates that can't be
+    compared raise with the report untouched.
+    """
+    timeline = items.get("timeline")
+    if timeline:
+        if len(timeline) == 1:
+            # Keep the timeline sorted by date: binary-search the slot after any equal dates
+            index = bisect_right(report.timeline, timeline[0].date, key=attrgetter("date"))
+        else:
+            # Stable sort: new events land after existing events with the same date
+            merged = sorted(report.timeline + timeline, key=attrgetter("date"))
+
+    for key, new in items.items():
+        if not new:
+            continue
+        if key != "timeline":
+            getattr(report, key).extend(new)
+        elif len(new) == 1:
+            report.timeline.insert(index, new[0])
+        else:
+            report.timeline[:] = merged
+    report.updated_at = ts
+
+
+def _add_items(report: Report, items: Dict[str, list]) -> None:
+    """Add items to a report and journal the change."""
+    ts = _now()
+    _apply_items(report, items, ts)
+    _journal(report, {"op": "add", "ts": ts, "items": items})
+
+
+def _replay_journal(path: Path) -> Optional[Report]:
+    """Rebuild a report from its JSONL journal."""
+    report = None
+    with path.open("rb") as f:
+        for line in f:
+            try:
+                entry = orjson.loads(line)
+            except ValueError:
+                continue  # torn line from an interrupted write
+            if entry["op"] == "create":
+                report = Report(**entry["report"])
+            elif report is not None:
+                items = {key: [ITEM_TYPES[key](**item) for item in new]
+                         for key, new in entry["items"].items()}
+                _apply_items(report, items, entry["ts"])
+    return report
+
+
+def _cache_report(report: Report) -> None:
+    """Put a report in the in-memory LRU, evicting the least recently used past REPORT_CACHE_MAX."""
+    REPORTS[report.id] = report
+    REPORTS.move_to_end(report.id)
+    while len(REPORTS) > REPORT_CACHE_MAX:
+        REPORTS.popitem(last=False)  # already on disk in its journal
+
+
+def _get_report(report_id: str) -> Optional[Report]:
+    """Look up a report, replaying its journal if it isn't in memory."""
+    report = REPORTS.get(report_id)
+    if report is not None:
+        REPORTS.move_to_end(report_id)
+        return report
+    path = REPORT_JOURNALS.get(report_id)
+    if path is None:
+        return None
+    try:
+        report = _replay_journal(path)
+    except FileNotFoundError:
+        return None
+    if report is not None:
+        _cache_report(report)
+    return report
+
+
+def _index_journals() -> None:
+    """Index every journaled report by ID and case; contents load lazily via _get_report.
+
+    IDs come from each journal's create record rather than its path, so
+    reports under older directory layouts are still found.
+    """
+    for path in sorted(REPORTS_DIR.glob("**/*.jsonl")):
+        try:
+            with path.open("rb") as f:
+                entry = orjson.loads(f.readline())
+            record = entry["report"] if entry["op"] == "create" else None
+            report_id, case_id = record["id"], record["case_id"]
+        except (OSError, ValueError, KeyError, TypeError):
+            continue  # not a report journal, or its create record is torn
+        REPORT_JOURNALS[report_id] = path
+        REPORTS_BY_CASE[case_id].append(report_id)
+
+
+_index_journals()
+
+
 async def create_report(case_id: str, report_type: str, title: str) -> str:
     """Create a new report."""
-    report_id = str(uuid.uuid4())[:8]
-
-    REPORTS[report_id] = {
-        "id": report_id,
-        "case_id": case_id,
-        "type": report_type,
-        "title": title,
-        "created_at": datetime.utcnow().isoformat(),
-        "updated_at": datetime.utcnow().isoformat(),
-        "sections": [],
-        "findings": [],
-        "contradictions": [],
-        "brady_items": [],
-        "timeline": [],
-        "citations": []
-    }
+    if "/" in case_id or "\\" in case_id:
+        return f"Invalid case_id: {case_id} (path separators are not allowed)"
+    report_id = _new_id()
+
+    now = _now()
+    report = Report(id=report_id, case_id=case_id, type=report_type, title=title,
+                    created_at=now, updated_at=now, slug=_slugify(title))
+    _cache_report(report)
+    REPORTS_BY_CASE[case_id].append(report_id)
+    _journal(report, {"op": "create", "report": {name: getattr(report, name) for name in _RECORD_FIELDS}})
 
     return f"**Report Created**\n\n**ID:** `{report_id}`\n**Type:** {report_type}\n**Title:** {title}"
 
 
 async def add_section(report_id: str, heading: str, content: str, level: int = 2) -> str:
     """Add a section to report."""
-    if report_id not in REPORTS:
+    report = _get_report(report_id)
+    if report is None:
         return f"Report not found: {report_id}"
 
-    section_id = str(uuid.uuid4())[:8]
-    REPORTS[report_id]["sections"].append({
-        "id": section_id,
-        "heading": heading,
-        "content": content,
-        "level": level
-    })
-    REPORTS[report_id]["updated_at"] = datetime.utcnow().isoformat()
+    section_id = _new_id()
+    _add_items(report, {"sections": [Section(section_id, heading, content, level)]})
 
     return f"**Section Added**\n\n**ID:** `{section_id}`\n**Heading:** {heading}"
 
@@ -269,17 +653,12 @@ async def add_section(report_id: str, heading: str, content: str, level: int = 2
 async def add_finding(report_id: str, finding: str, sources: List[str] = None,
                        confidence: str = "MEDIUM") -> str:
     """Add a finding to report."""
-    if report_id not in REPORTS:
+    report = _get_report(report_id)
+    if report is None:
         return f"Report not found: {report_id}"
 
-    finding_id = str(uuid.uuid4())[:8]
-    REPORTS[report_id]["findings"].append({
-        "id": finding_id,
-        "finding": finding,
-        "sources": sources or [],
-        "confidence": confidence
-    })
-    REPORTS[report_id]["updated_at"] = datetime.utcnow().isoformat()
+    finding_id = _new_id()
+    _add_items(report, {"findings": [Finding(finding_id, finding, sources or [], confidence)]})
 
     return f"**Finding Added**\n\n**ID:** `{finding_id}`\n**Confidence:** {confidence}"
 
@@ -287,18 +666,12 @@ async def add_finding(report_id: str, finding: str, sources: List[str] = None,
 async def add_contradiction(report_id: str, source1: dict, source2: dict,
                             description: str, severity: str = "MEDIUM") -> str:
     """Add a contradiction to report."""
-    if report_id not in REPORTS:
+    report = _get_report(report_id)
+    if report is None:
         return f"Report not found: {report_id}"
 
-    contradiction_id = str(uuid.uuid4())[:8]
-    REPORTS[report_id]["contradictions"].append({
-        "id": contradiction_id,
-        "source1": source1,
-        "source2": source2,
-        "description": description,
-        "severity": severity
-    })
-    REPORTS[report_id]["updated_at"] = datetime.utcnow().isoformat()
+    contradiction_id = _new_id()
+    _add_items(report, {"contradictions": [Contradiction(contradiction_id, source1, source2, description, severity)]})
 
     return f"**Contradiction Documented**\n\n**ID:** `{contradiction_id}`\n**Severity:** {severity}"
 
@@ -306,18 +679,12 @@ async def add_contradiction(report_id: str, source1: dict, source2: dict,
 async def add_brady_item(report_id: str, item_type: str, description: str,
                           sources: List[str] = None, priority: str = "MEDIUM") -> str:
     """Add Brady item to report."""
-    if report_id not in REPORTS:
+    report = _get_report(report_id)
+    if report is None:
         return f"Report not found: {report_id}"
 
-    item_id = str(uuid.uuid4())[:8]
-    REPORTS[report_id]["brady_items"].append({
-        "id": item_id,
-        "type": item_type,
-        "description": description,
-        "sources": sources or [],
-        "priority": priority
-    })
-    REPORTS[report_id]["updated_at"] = datetime.utcnow().isoformat()
+    item_id = _new_id()
+    _add_items(report, {"brady_items": [BradyItem(item_id, item_type, description, sources or [], priority)]})
 
     return f"**Brady Item Added**\n\n**ID:** `{item_id}`\n**Type:** {item_type}\n**Priority:** {priority}"
 
@@ -325,21 +692,15 @@ async def add_brady_item(report_id: str, item_type: str, description: str,
 async def add_timeline_event(report_id: str, date: str, event: str,
                               source: str = None, actors: List[str] = None) -> str:
     """Add timeline event to report."""
-    if report_id not in REPORTS:
+    report = _get_report(report_id)
+    if report is None:
         return f"Report not found: {report_id}"
 
-    event_id = str(uuid.uuid4())[:8]
-    REPORTS[report_id]["timeline"].append({
-        "id": event_id,
-        "date": date,
-        "event": event,
-        "source": source,
-        "actors": actors or []
-    })
-    REPORTS[report_id]["updated_at"] = datetime.utcnow().isoformat()
+    if not isinstance(date, str):
+        return "Timeline event rejected: date must be a string"
 
-    # Sort timeline by date
-    REPORTS[report_id]["timeline"].sort(key=lambda x: x["date"])
+    event_id = _new_id()
+    _add_items(report, {"timeline": [TimelineEvent(event_id, date, event, source, actors or [])]})
 
     return f"**Timeline Event Added**\n\n**ID:** `{event_id}`\n**Date:** {date}"
 
@@ -347,165 +708,342 @@ async def add_timeline_event(report_id: str, date: str, event: str,
 async def add_citation(report_id: str, citation: str, context: str,
                         verified: bool = True) -> str:
     """Add citation to report."""
-    if report_id not in REPORTS:
+    report = _get_report(report_id)
+    if report is None:
         return f"Report not found: {report_id}"
 
-    citation_id = str(uuid.uuid4())[:8]
-    REPORTS[report_id]["citations"].append({
-        "id": citation_id,
-        "citation": citation,
-        "context": context,
-        "verified": verified
-    })
-    REPORTS[report_id]["updated_at"] = datetime.utcnow().isoformat()
+    citation_id = _new_id()
+    _add_items(report, {"citations": [Citation(citation_id, citation, context, verified)]})
 
     verified_str = "✅ Verified" if verified else "⚠️ Unverified"
     return f"**Citation Added** {verified_str}\n\n**ID:** `{citation_id}`\n**Citation:** {citation}"
 
 
-def _generate_markdown(report: dict) -> str:
-    """Generate markdown content for a report."""
-    md = []
+async def add_batch(report_id: str, sections: List[dict] = None, findings: List[dict] = None,
+                    contradictions: List[dict] = None, brady_items: List[dict] = None,
+                    timeline: List[dict] = None, citations: List[dict] = None) -> str:
+    """Add many items to a report in one call, under one timestamp and one timeline sort."""
+    report = _get_report(report_id)
+    if report is None:
+        return f"Report not found: {report_id}"
+
+    # Check and build every item before touching the report so a bad item adds nothing
+    for key, items in (("sections", sections), ("findings", findings),
+                       ("contradictions", contradictions), ("brady_items", brady_items),
+                       ("timeline", timeline), ("citations", citations)):
+        if items is not None and not (isinstance(items, list) and all(isinstance(item, dict) for item in items)):
+            return f"Batch rejected: {key} must be a list of objects"
+    if any(not isinstance(t.get("date"), str) for t in timeline or []):
+        return "Batch rejected: timeline dates must be strings"
+
+    try:
+        new_items = {
+            "sections": [Section(_new_id(), s["heading"], s["content"], s.get("level", 2))
+                         for s in sections or []],
+            "findings": [Finding(_new_id(), f["finding"], f.get("sources") or [],
+                                 f.get("confidence", "MEDIUM"))
+                         for f in findings or []],
+            "contradictions": [Contradiction(_new_id(), c["source1"], c["source2"], c["description"],
+                                             c.get("severity", "MEDIUM"))
+                               for c in contradictions or []],
+            "brady_items": [BradyItem(_new_id(), b["item_type"], b["description"], b.get("sources") or [],
+                                      b.get("priority", "MEDIUM"))
+                            for b in brady_items or []],
+            "timeline": [TimelineEvent(_new_id(), t["date"], t["event"], t.get("source"), t.get("actors") or [])
+                         for t in timeline or []],
+            "citations": [Citation(_new_id(), c["citation"], c["context"], c.get("verified", True))
+                          for c in citations or []]
+        }
+    except KeyError as e:
+        return f"Batch rejected: item missing required field {e}"
+    except (TypeError, AttributeError) as e:
+        return f"Batch rejected: malformed item ({e})"
+
+    _add_items(report, new_items)
+
+    output = f"**Batch Added**\n\n**Report:** `{report_id}`\n"
+    for key, label in (("sections", "Sections"), ("findings", "Findings"),
+                       ("contradictions", "Contradictions"), ("brady_items", "Brady Items"),
+                       ("timeline", "Timeline Events"), ("citations", "Citations")):
+        if new_items[key]:
+            output += f"  - {label}: {len(new_items[key])}\n"
+    return output
+
+
+# Markdown marker for a HIGH/MEDIUM/LOW confidence, severity or priority
+LEVEL_ICONS = {"HIGH": "🔴", "MEDIUM": "🟡", "LOW": "🟢"}
+
+
+def _write_markdown(out: TextIO, report: Report) -> None:
+    """Write a report's markdown to a text stream (a StringIO or an open file)."""
+    write = out.write
+    level_icon = LEVEL_ICONS.get
 
     # Title and metadata
-    md.append(f"# {report['title']}\n")
-    md.append(f"**Case:** {report['case_id']}")
-    md.append(f"**Type:** {report['type']}")
-    md.append(f"**Generated:** {datetime.utcnow().strftime('%Y-%m-%d %H:%M UTC')}")
-    md.append("")
-    md.append("---")
-    md.append("")
+    write(f"# {report.title}\n\n")
+    write(f"**Case:** {report.case_id}\n")
+    write(f"**Type:** {report.type}\n")
+    write(f"**Generated:** {datetime.utcnow().strftime('%Y-%m-%d %H:%M UTC')}\n")
+    write("\n---\n\n")
 
     # Sections
-    for section in report.get("sections", []):
-        level = section.get("level", 2)
-        md.append(f"{'#' * level} {section['heading']}\n")
-        md.append(section['content'])
-        md.append("")
+    for section in report.sections:
+        write(f"{'#' * section.level} {section.heading}\n\n")
+        write(section.content)
+        write("\n\n")
 
     # Findings
-    if report.get("findings"):
-        md.append("## Key Findings\n")
-        for i, finding in enumerate(report["findings"], 1):
-            confidence_icon = {"HIGH": "🔴", "MEDIUM": "🟡", "LOW": "🟢"}.get(finding["confidence"], "⚪")
-            md.append(f"{i}. {confidence_icon} **{finding['confidence']}** - {finding['finding']}")
-            if finding.get("sources"):
-                md.append(f"   - Sources: {', '.join(finding['sources'])}")
-        md.append("")
+    if report.findings:
+        write("## Key Findings\n\n")
+        for i, finding in enumerate(report.findings, 1):
+            confidence_icon = level_icon(finding.confidence, "⚪")
+            write(f"{i}. {confidence_icon} **{finding.confidence}** - {finding.finding}\n")
+            if finding.sources:
+                write(f"   - Sources: {', '.join(finding.sources)}\n")
+        write("\n")
 
     # Contradictions
-    if report.get("contradictions"):
-        md.append("## Contradictions Found\n")
-        for i, contra in enumerate(report["contradictions"], 1):
-            severity_icon = {"HIGH": "🔴", "MEDIUM": "🟡", "LOW": "🟢"}.get(contra["severity"], "⚪")
-            md.append(f"### {i}. {severity_icon} {contra['description']}\n")
-            md.append(f"**Source 1 ({contra['source1'].get('doc', 'Unknown')}):**")
-            md.append(f"> {contra['source1'].get('quote', 'N/A')}\n")
-            md.append(f"**Source 2 ({contra['source2'].get('doc', 'Unknown')}):**")
-            md.append(f"> {contra['source2'].get('quote', 'N/A')}\n")
-        md.append("")
+    if report.contradictions:
+        write("## Contradictions Found\n\n")
+        for i, contra in enumerate(report.contradictions, 1):
+            severity_icon = level_icon(contra.severity, "⚪")
+            write(f"### {i}. {severity_icon} {contra.description}\n\n")
+            write(f"**Source 1 ({contra.source1.get('doc', 'Unknown')}):**\n")
+            write(f"> {contra.source1.get('quote', 'N/A')}\n\n")
+            write(f"**Source 2 ({contra.source2.get('doc', 'Unknown')}):**\n")
+            write(f"> {contra.source2.get('quote', 'N/A')}\n\n")
+        write("\n")
 
     # Brady Items
-    if report.get("brady_items"):
-        md.append("## Brady/Giglio Material\n")
-        md.append("| Priority | Type | Description | Sources |")
-        md.append("|----------|------|-------------|---------|")
-        for item in report["brady_items"]:
-            priority_icon = {"HIGH": "🔴", "MEDIUM": "🟡", "LOW": "🟢"}.get(item["priority"], "⚪")
-            sources = ", ".join(item.get("sources", [])) or "N/A"
-            md.append(f"| {priority_icon} {item['priority']} | {item['type']} | {item['description'][:50]}... | {sources} |")
-        md.append("")
+    if report.brady_items:
+        write("## Brady/Giglio Material\n\n")
+        write("| Priority | Type | Description | Sources |\n")
+        write("|----------|------|-------------|---------|\n")
+        for item in report.brady_items:
+            priority_icon = level_icon(item.priority, "⚪")
+            sources = ", ".join(item.sources) or "N/A"
+            write(f"| {priority_icon} {item.priority} | {item.type} | {item.description[:50]}... | {sources} |\n")
+        write("\n")
 
     # Timeline
-    if report.get("timeline"):
-        md.append("## Timeline\n")
-        for event in report["timeline"]:
-            actors_str = f" ({', '.join(event['actors'])})" if event.get("actors") else ""
-            source_str = f" [Source: {event['source']}]" if event.get("source") else ""
-            md.append(f"- **{event['date']}:** {event['event']}{actors_str}{source_str}")
-        md.append("")
+    if report.timeline:
+        write("## Timeline\n\n")
+        for event in report.timeline:
+            actors_str = f" ({', '.join(event.actors)})" if event.actors else ""
+            source_str = f" [Source: {event.source}]" if event.source else ""
+            write(f"- **{event.date}:** {event.event}{actors_str}{source_str}\n")
+        write("\n")
 
     # Citations
-    if report.get("citations"):
-        md.append("## Legal Citations\n")
-        for citation in report["citations"]:
-            verified_str = "✅" if citation["verified"] else "⚠️"
-            md.append(f"- {verified_str} **{citation['citation']}** - {citation['context']}")
-        md.append("")
+    if report.citations:
+        write("## Legal Citations\n\n")
+        for citation in report.citations:
+            verified_str = "✅" if citation.verified else "⚠️"
+            write(f"- {verified_str} **{citation.citation}** - {citation.context}\n")
+        write("\n")
 
     # Footer
-    md.append("---")
-    md.append("*Generated by LegalAI Report Writer MCP*")
+    write("---\n")
+    write("*Generated by LegalAI Report Writer MCP*")
 
-    return "\n".join(md)
 
+def _generate_markdown(report: Report) -> str:
+    """Generate markdown content for a report."""
+    buf = io.StringIO()
+    _write_markdown(buf, report)
+    return buf.getvalue()
 
-async def export_markdown(report_id: str, output_path: str = None) -> str:
-    """Export report as Markdown."""
-    if report_id not in REPORTS:
-        return f"Report not found: {report_id}"
 
-    report = REPORTS[report_id]
-    md_content = _generate_markdown(report)
+def _get_markdown(report: Report) -> bytes:
+    """Return the report's markdown as UTF-8, re-rendering only if the report changed since the last export.
+
+    The encoded form is what gets cached, so repeat exports write it to disk
+    without another encode pass.
+    """
+    cached = report.md_cache
+    if cached is not None and cached[0] == report.updated_at:
+        return cached[1]
+    md_content = _generate_markdown(report).encode("utf-8")
+    report.md_cache = (report.updated_at, md_content)
+    return md_content
+
+
+def _write_gzip(path: Path, content: bytes) -> int:
+    """Write gzip-compressed content and return the compressed size (called via asyncio.to_thread)."""
+    data = gzip.compress(content, compresslevel=GZIP_LEVEL)
+    path.write_bytes(data)
+    return len(data)
+
+
+async def export_markdown(report_id: str, output_path: str = None, compress: bool = False) -> str:
+    """Export report as Markdown (optionally gzip-compressed)."""
+    report = _get_report(report_id)
+    if report is None:
+        return f"Report not found: {report_id}"
+    md_content = _get_markdown(report)
 
     # Determine output path
     if output_path:
         file_path = Path(output_path)
     else:
-        safe_title = "".join(c if c.isalnum() or c in "-_ " else "" for c in report["title"])
-        safe_title = safe_title.replace(" ", "-").lower()[:50]
-        file_path = REPORTS_DIR / report["case_id"] / f"{safe_title}.md"
+        file_path = _case_dir(report.case_id) / f"{report.slug}.md"
+    if compress and file_path.suffix != ".gz":
+        file_path = file_path.with_name(file_path.name + ".gz")
+
+    await _ensure_dir_async(file_path.parent)
+    writer = _write_gzip if compress else Path.write_bytes
+    size = await asyncio.to_thread(writer, file_path, md_content)
+
+    return f"**Markdown Exported**\n\n**Path:** `{file_path}`\n**Size:** {size:,} bytes"
+
+
+# Markdown converter and parsed stylesheet, reused across PDF exports
+# (each export worker process keeps its own)
+_PDF_MARKDOWN = markdown.Markdown(extensions=["tables"]) if WEASYPRINT_AVAILABLE else None
+_PDF_STYLESHEET = None
 
-    file_path.parent.mkdir(parents=True, exist_ok=True)
-    file_path.write_text(md_content, encoding="utf-8")
+# WeasyPrint and python-docx rendering is CPU-bound; it runs in worker
+# processes so exports don't stall other SSE clients on the event loop
+EXPORT_WORKERS = int(os.environ.get("EXPORT_WORKERS", str(os.cpu_count() or 1)))
+_EXPORT_POOL: Optional[ProcessPoolExecutor] = None
 
-    return f"**Markdown Exported**\n\n**Path:** `{file_path}`\n**Size:** {len(md_content):,} bytes"
+
+def _pdf_stylesheet():
+    """Parse the PDF stylesheet on first use and keep it for later exports."""
+    global _PDF_STYLESHEET
+    if _PDF_STYLESHEET is None:
+        css_path = TEMPLATES_DIR / "report.css"
+        if css_path.is_file():
+            _PDF_STYLESHEET = CSS(filename=str(css_path))
+        else:
+            _PDF_STYLESHEET = CSS(string=PDF_CSS)
+    return _PDF_STYLESHEET
+
+
+def get_export_pool() -> ProcessPoolExecutor:
+    """Get the worker pool for CPU-heavy exports, created on first use."""
+    global _EXPORT_POOL
+    if _EXPORT_POOL is None:
+        # Not fork: by now to_thread workers exist, and a forked child can
+        # inherit one of their locks held and deadlock on it
+        _EXPORT_POOL = ProcessPoolExecutor(max_workers=EXPORT_WORKERS,
+                                           mp_context=multiprocessing.get_context("forkserver"))
+    return _EXPORT_POOL
+
+
+async def close_export_pool(app=None):
+    """Shut down export workers (registered as an aiohttp cleanup hook)."""
+    global _EXPORT_POOL
+    if _EXPORT_POOL is not None:
+        _EXPORT_POOL.shutdown(wait=False, cancel_futures=True)
+        _EXPORT_POOL = None
+
+
+def _render_pdf_sync(md_content: bytes, file_path: str) -> None:
+    """Render UTF-8 markdown to a PDF file with WeasyPrint (runs in an export worker)."""
+    html = _PDF_MARKDOWN.reset().convert(md_content.decode("utf-8"))
+    HTML(string=html).write_pdf(file_path, stylesheets=[_pdf_stylesheet()])
+
+
+def _render_docx_sync(report: Report, file_path: str) -> None:
+    """Build and save a Word document for a report (runs in an export worker)."""
+    from docx import Document
+    from docx.enum.text import WD_ALIGN_PARAGRAPH
+
+    doc = Document()
+
+    # Title
+    title = doc.add_heading(report.title, 0)
+    title.alignment = WD_ALIGN_PARAGRAPH.CENTER
+
+    # Metadata
+    doc.add_paragraph(f"Case: {report.case_id}")
+    doc.add_paragraph(f"Type: {report.type}")
+    doc.add_paragraph(f"Generated: {datetime.utcnow().strftime('%Y-%m-%d %H:%M UTC')}")
+    doc.add_paragraph()
+
+    # Sections
+    for section in report.sections:
+        doc.add_heading(section.heading, level=section.level)
+        doc.add_paragraph(section.content)
+
+    # Findings
+    if report.findings:
+        doc.add_heading("Key Findings", level=2)
+        for i, finding in enumerate(report.findings, 1):
+            para = doc.add_paragraph()
+            para.add_run(f"{i}. [{finding.confidence}] ").bold = True
+            para.add_run(finding.finding)
+            if finding.sources:
+                doc.add_paragraph(f"   Sources: {', '.join(finding.sources)}")
+
+    # Brady Items
+    if report.brady_items:
+        doc.add_heading("Brady/Giglio Material", level=2)
+        for item in report.brady_items:
+            para = doc.add_paragraph()
+            para.add_run(f"[{item.priority}] {item.type.upper()}: ").bold = True
+            para.add_run(item.description)
+
+    # Timeline
+    if report.timeline:
+        doc.add_heading("Timeline", level=2)
+        for event in report.timeline:
+            para = doc.add_paragraph()
+            para.add_run(f"{event.date}: ").bold = True
+            para.add_run(event.event)
+
+    doc.save(file_path)
 
 
 async def export_pdf(report_id: str, output_path: str = None) -> str:
     """Export report as PDF."""
-    if report_id not in REPORTS:
+    report = _get_report(report_id)
+    if report is None:
         return f"Report not found: {report_id}"
 
-    report = REPORTS[report_id]
-
     # First generate markdown
-    md_content = _generate_markdown(report)
+    md_content = _get_markdown(report)
 
     # Determine output path
     if output_path:
         file_path = Path(output_path)
     else:
-        safe_title = "".join(c if c.isalnum() or c in "-_ " else "" for c in report["title"])
-        safe_title = safe_title.replace(" ", "-").lower()[:50]
-        file_path = REPORTS_DIR / report["case_id"] / f"{safe_title}.pdf"
+        file_path = _case_dir(report.case_id) / f"{report.slug}.pdf"
 
-    file_path.parent.mkdir(parents=True, exist_ok=True)
+    await _ensure_dir_async(file_path.parent)
 
-    # Try to convert to PDF using available tools
+    if WEASYPRINT_AVAILABLE and PDF_ENGINE != "pandoc":
+        try:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(get_export_pool(), _render_pdf_sync, md_content, str(file_path))
+            return f"**PDF Exported**\n\n**Path:** `{file_path}`"
+        except Exception as e:
+            return f"Error exporting PDF: {str(e)}"
+
+    # Fall back to pandoc + xelatex
     try:
-        # Try pandoc first
-        import subprocess
         md_path = file_path.with_suffix(".md")
-        md_path.write_text(md_content, encoding="utf-8")
+        await asyncio.to_thread(md_path.write_bytes, md_content)
 
-        result = subprocess.run(
-            ["pandoc", str(md_path), "-o", str(file_path), "--pdf-engine=xelatex"],
-            capture_output=True,
-            text=True
+        proc = await asyncio.create_subprocess_exec(
+            "pandoc", str(md_path), "-o", str(file_path), "--pdf-engine=xelatex",
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.PIPE
         )
+        _, stderr = await proc.communicate()
 
-        if result.returncode == 0:
+        if proc.returncode == 0:
             md_path.unlink()  # Clean up temp markdown
             return f"**PDF Exported**\n\n**Path:** `{file_path}`"
         else:
             # Pandoc failed, save as markdown instead
-            return f"**PDF conversion failed** (pandoc not available)\n\nMarkdown saved to: `{md_path}`\n\nError: {result.stderr[:200]}"
+            return f"**PDF conversion failed** (pandoc not available)\n\nMarkdown saved to: `{md_path}`\n\nError: {stderr.decode(errors='replace')[:200]}"
 
     except FileNotFoundError:
         # Pandoc not installed, save markdown as fallback
         md_path = file_path.with_suffix(".md")
-        md_path.write_text(md_content, encoding="utf-8")
+        await asyncio.to_thread(md_path.write_bytes, md_content)
         return f"**PDF export unavailable** (pandoc not installed)\n\nMarkdown saved to: `{md_path}`"
     except Exception as e:
         return f"Error exporting PDF: {str(e)}"
@@ -513,78 +1051,29 @@ async def export_pdf(report_id: str, output_path: str = None) -> str:
 
 async def export_docx(report_id: str, output_path: str = None) -> str:
     """Export report as Word document."""
-    if report_id not in REPORTS:
+    report = _get_report(report_id)
+    if report is None:
         return f"Report not found: {report_id}"
 
-    report = REPORTS[report_id]
-
     # Determine output path
     if output_path:
         file_path = Path(output_path)
     else:
-        safe_title = "".join(c if c.isalnum() or c in "-_ " else "" for c in report["title"])
-        safe_title = safe_title.replace(" ", "-").lower()[:50]
-        file_path = REPORTS_DIR / report["case_id"] / f"{safe_title}.docx"
+        file_path = _case_dir(report.case_id) / f"{report.slug}.docx"
 
-    file_path.parent.mkdir(parents=True, exist_ok=True)
+    await _ensure_dir_async(file_path.parent)
 
     try:
-        from docx import Document
-        from docx.shared import Inches, Pt
-        from docx.enum.text import WD_ALIGN_PARAGRAPH
-
-        doc = Document()
-
-        # Title
-        title = doc.add_heading(report["title"], 0)
-        title.alignment = WD_ALIGN_PARAGRAPH.CENTER
-
-        # Metadata
-        doc.add_paragraph(f"Case: {report['case_id']}")
-        doc.add_paragraph(f"Type: {report['type']}")
-        doc.add_paragraph(f"Generated: {datetime.utcnow().strftime('%Y-%m-%d %H:%M UTC')}")
-        doc.add_paragraph()
-
-        # Sections
-        for section in report.get("sections", []):
-            doc.add_heading(section["heading"], level=section.get("level", 2))
-            doc.add_paragraph(section["content"])
-
-        # Findings
-        if report.get("findings"):
-            doc.add_heading("Key Findings", level=2)
-            for i, finding in enumerate(report["findings"], 1):
-                para = doc.add_paragraph()
-                para.add_run(f"{i}. [{finding['confidence']}] ").bold = True
-                para.add_run(finding["finding"])
-                if finding.get("sources"):
-                    doc.add_paragraph(f"   Sources: {', '.join(finding['sources'])}")
-
-        # Brady Items
-        if report.get("brady_items"):
-            doc.add_heading("Brady/Giglio Material", level=2)
-            for item in report["brady_items"]:
-                para = doc.add_paragraph()
-                para.add_run(f"[{item['priority']}] {item['type'].upper()}: ").bold = True
-                para.add_run(item["description"])
-
-        # Timeline
-        if report.get("timeline"):
-            doc.add_heading("Timeline", level=2)
-            for event in report["timeline"]:
-                para = doc.add_paragraph()
-                para.add_run(f"{event['date']}: ").bold = True
-                para.add_run(event["event"])
-
-        doc.save(str(file_path))
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(get_export_pool(), _render_docx_sync, report, str(file_path))
 
         return f"**DOCX Exported**\n\n**Path:** `{file_path}`"
 
     except ImportError:
         # python-docx not installed, fall back to markdown
-        md_content = _generate_markdown(report)
+        md_content = _get_markdown(report)
         md_path = file_path.with_suffix(".md")
-        md_path.write_text(md_content, encoding="utf-8")
+        await asyncio.to_thread(md_path.write_bytes, md_content)
         return f"**DOCX export unavailable** (python-docx not installed)\n\nMarkdown saved to: `{md_path}`"
     except Exception as e:
         return f"Error exporting DOCX: {str(e)}"
@@ -592,41 +1081,40 @@ async def export_docx(report_id: str, output_path: str = None) -> str:
 
 async def get_report_status(report_id: str) -> str:
     """Get report status and contents."""
-    if report_id not in REPORTS:
+    report = _get_report(report_id)
+    if report is None:
         return f"Report not found: {report_id}"
 
-    report = REPORTS[report_id]
-
-    output = f"**Report: {report['title']}**\n\n"
+    output = f"**Report: {report.title}**\n\n"
     output += f"**ID:** `{report_id}`\n"
-    output += f"**Case:** {report['case_id']}\n"
-    output += f"**Type:** {report['type']}\n"
-    output += f"**Created:** {report['created_at']}\n"
-    output += f"**Updated:** {report['updated_at']}\n\n"
+    output += f"**Case:** {report.case_id}\n"
+    output += f"**Type:** {report.type}\n"
+    output += f"**Created:** {report.created_at}\n"
+    output += f"**Updated:** {report.updated_at}\n\n"
 
     output += "**Contents:**\n"
-    output += f"  - Sections: {len(report.get('sections', []))}\n"
-    output += f"  - Findings: {len(report.get('findings', []))}\n"
-    output += f"  - Contradictions: {len(report.get('contradictions', []))}\n"
-    output += f"  - Brady Items: {len(report.get('brady_items', []))}\n"
-    output += f"  - Timeline Events: {len(report.get('timeline', []))}\n"
-    output += f"  - Citations: {len(report.get('citations', []))}\n"
+    output += f"  - Sections: {len(report.sections)}\n"
+    output += f"  - Findings: {len(report.findings)}\n"
+    output += f"  - Contradictions: {len(report.contradictions)}\n"
+    output += f"  - Brady Items: {len(report.brady_items)}\n"
+    output += f"  - Timeline Events: {len(report.timeline)}\n"
+    output += f"  - Citations: {len(report.citations)}\n"
 
     return output
 
 
 async def list_reports(case_id: str) -> str:
     """List reports for a case."""
-    case_reports = [r for r in REPORTS.values() if r["case_id"] == case_id]
+    case_reports = [r for r in map(_get_report, REPORTS_BY_CASE.get(case_id, ())) if r is not None]
 
     if not case_reports:
         return f"No reports found for case: {case_id}"
 
     output = f"**Reports for {case_id} ({len(case_reports)}):**\n\n"
     for report in case_reports:
-        output += f"**{report['title']}**\n"
-        output += f"   ID: `{report['id']}` | Type: {report['type']}\n"
-        output += f"   Created: {report['created_at']}\n\n"
+        output += f"**{report.title}**\n"
+        output += f"   ID: `{report.id}` | Type: {report.type}\n"
+        output += f"   Created: {report.created_at}\n\n"
 
     return output
 
@@ -640,6 +1128,7 @@ TOOL_HANDLERS = {
     "add_brady_item": add_brady_item,
     "add_timeline_event": add_timeline_event,
     "add_citation": add_citation,
+    "add_batch": add_batch,
     "export_markdown": export_markdown,
     "export_pdf": export_pdf,
     "export_docx": export_docx,
@@ -647,16 +1136,28 @@ TOOL_HANDLERS = {
     "list_reports": list_reports
 }
 
+# Bound once per tools/call to reject bad arguments before the tool runs
+TOOL_SIGNATURES = {name: inspect.signature(handler) for name, handler in TOOL_HANDLERS.items()}
+
 
 # ============================================================================
 # MCP Protocol Handlers
 # ============================================================================
 
+def _invalid_params(request_id) -> dict:
+    """JSON-RPC error for a tools/call whose params don't fit the tool."""
+    return {
+        "jsonrpc": "2.0",
+        "id": request_id,
+        "error": {"code": -32602, "message": "Invalid params"}
+    }
+
+
 async def handle_mcp_request(data: dict, session_id: str = None) -> dict:
     """Handle a JSON-RPC MCP request and return response."""
     method = data.get("method", "")
     request_id = data.get("id")
-    params = data.get("params", {})
+    params = data.get("params") or {}
 
     if method == "initialize":
         return {
@@ -672,11 +1173,13 @@ async def handle_mcp_request(data: dict, session_id: str = None) -> dict:
         return {
             "jsonrpc": "2.0",
             "id": request_id,
-            "result": {"tools": TOOLS}
+            "_raw_result": TOOLS_LIST_RESULT
         }
     elif method == "tools/call":
+        if not isinstance(params, dict):
+            return _invalid_params(request_id)
         tool_name = params.get("name")
-        arguments = params.get("arguments", {})
+        arguments = params.get("arguments") or {}
 
         if tool_name not in TOOL_HANDLERS:
             return {
@@ -686,7 +1189,14 @@ async def handle_mcp_request(data: dict, session_id: str = None) -> dict:
             }
 
         handler = TOOL_HANDLERS[tool_name]
-        result = await handler(**arguments)
+        try:
+            bound = TOOL_SIGNATURES[tool_name].bind(**arguments)
+        except (TypeError, KeyError):
+            # Missing/unknown arguments, or arguments that aren't an object
+            logger.warning("Invalid arguments for %s", tool_name, exc_info=True)
+            return _invalid_params(request_id)
+        _REQUEST_TS.set(datetime.utcnow().isoformat())
+        result = await handler(*bound.args, **bound.kwargs)
 
         return {
             "jsonrpc": "2.0",
@@ -703,110 +1213,293 @@ async def handle_mcp_request(data: dict, session_id: str = None) -> dict:
         }
 
 
+def encode_response(response_data: dict) -> bytes:
+    """Serialize a JSON-RPC response, splicing in a pre-serialized "_raw_result"."""
+    raw_result = response_data.get("_raw_result")
+    if raw_result is None:
+        return orjson.dumps(response_data)
+    return b'{"jsonrpc":"2.0","id":' + orjson.dumps(response_data.get("id")) + b',"result":' + raw_result + b'}'
+
+
+# Sent on every response; handlers set it directly rather than via middleware
+CORS_HEADERS = {'Access-Control-Allow-Origin': '*'}
+
+
+def _json(obj: Any, **kwargs) -> web.Response:
+    """orjson-backed stand-in for web.json_response."""
+    return web.Response(body=orjson.dumps(obj), content_type="application/json",
+                        headers=CORS_HEADERS, **kwargs)
+
+
+_UNAUTHORIZED_BODY = orjson.dumps({"error": "Unauthorized"})
+
+
+def _unauthorized() -> web.Response:
+    """401 response built from the pre-serialized body (Responses can't be shared)."""
+    return web.Response(body=_UNAUTHORIZED_BODY, status=401, content_type="application/json",
+                        headers=CORS_HEADERS)
+
+
 # ============================================================================
 # HTTP+SSE Endpoints
 # ============================================================================
 
+def _token_matches(candidate: Optional[str]) -> bool:
+    """Compare a presented token to AUTH_TOKEN in constant time (no timing side channel)."""
+    # Non-UTF-8 header/query bytes reach us as lone surrogates; surrogatepass
+    # encodes any str without raising (such a value simply never matches)
+    return candidate is not None and hmac.compare_digest(
+        candidate.encode("utf-8", "surrogatepass"), AUTH_TOKEN_BYTES)
+
+
 def verify_auth(request) -> bool:
     """Verify authorization token."""
-    if not AUTH_TOKEN:
+    auth_header = request.headers.get("Authorization")
+    if (auth_header is not None and len(auth_header) == _BEARER_HEADER_LEN
+            and auth_header.startswith(_BEARER_PREFIX)
+            and _token_matches(auth_header[_BEARER_LEN:])):
         return True
-
-    auth_header = request.headers.get("Authorization", "")
-    if auth_header.startswith("Bearer ") and auth_header[7:] == AUTH_TOKEN:
+    if _token_matches(request.headers.get("api_key")):
         return True
-    if request.headers.get("api_key") == AUTH_TOKEN:
-        return True
-    if request.query.get("api_key") == AUTH_TOKEN:
+    if _token_matches(request.query.get("api_key")):
         return True
     return False
 
 
+if not AUTH_TOKEN:
+    # Auth disabled: bind a no-op so requests skip the token checks entirely
+    def verify_auth(request) -> bool:
+        """Accept every request (MCP_AUTH_TOKEN is unset)."""
+        return True
+
+
 async def handle_sse_get(request):
     """SSE endpoint for MCP protocol."""
     if not verify_auth(request):
-        return web.json_response({"error": "Unauthorized"}, status=401)
-
-    session_id = str(uuid.uuid4())
-
-    response = web.StreamResponse(
-        status=200,
-        headers={
-            'Content-Type': 'text/event-stream',
-            'Cache-Control': 'no-cache',
-            'Connection': 'keep-alive',
-            'Access-Control-Allow-Origin': '*',
-        }
-    )
-    await response.prepare(request)
-
-    SSE_SESSIONS[session_id] = response
-
+        return _unauthorized()
+
+    session_id, replay = _resume_session(request.headers.get("Last-Event-ID"))
+    if session_id is None:
+        session_id = uuid.uuid4().hex
+        SSE_HISTORY[session_id] = deque(maxlen=SSE_REPLAY_SIZE)
+        if len(SSE_HISTORY) > SSE_HISTORY_MAX:
+            SSE_HISTORY.popitem(last=False)
+
+    headers = {
+        'Content-Type': 'text/event-stream',
+        'Cache-Control': 'no-cache',
+        'Connection': 'keep-alive',
+        'Access-Control-Allow-Origin': '*',
+        # Stop nginx/ingress from buffering the stream into bursts
+        'X-Accel-Buffering': 'no',
+    }
+    # Large tool results compress well; each frame is sync-flushed so the
+    # client can decode it as soon as it arrives
+    compressor = None
+    if SSE_GZIP and "gzip" in request.headers.get("Accept-Encoding", ""):
+        compressor = zlib.compressobj(1, zlib.DEFLATED, 31)
+        headers['Content-Encoding'] = 'gzip'
+
+    # Registered before the first await, so no event lands between computing
+    # the replay and this connection taking over the session
+    queue: asyncio.Queue = asyncio.Queue(maxsize=SSE_MAX_QUEUE_SIZE)
+    SSE_SESSIONS[session_id] = queue
+
+    response = web.StreamResponse(status=200, headers=headers)
     try:
-        await response.write(f"event: endpoint\ndata: /sse?session_id={session_id}\n\n".encode())
-
-        while True:
-            await asyncio.sleep(30)
-            try:
-                await response.write(f": ping\n\n".encode())
-            except:
-                break
-
-    except asyncio.CancelledError:
+        await response.prepare(request)
+        # Keep nothing buffered in the transport so a stalled client blocks this
+        # session's writer instead of piling frames up in memory
+        if request.transport is not None:
+            request.transport.set_write_buffer_limits(high=0)
+            _enable_tcp_keepalive(request.transport)
+
+        frame = ENDPOINT_TMPL % session_id.encode("ascii") + b"".join(replay)
+
+        # This handler is the session's only writer: it drains queued frames
+        # (already numbered by _number_frame) until the client disconnects or
+        # the session is closed (None)
+        while frame is not None:
+            if compressor is not None:
+                await response.write(compressor.compress(frame) + compressor.flush(zlib.Z_SYNC_FLUSH))
+            else:
+                await response.write(frame)
+            frame = await queue.get()
+            if frame is not None and frame is not PING_BYTES:
+                SSE_ACTIVE.add(session_id)
+
+    except (ConnectionResetError, asyncio.CancelledError):
         pass
     finally:
-        SSE_SESSIONS.pop(session_id, None)
+        if SSE_SESSIONS.get(session_id) is queue:
+            SSE_SESSIONS.pop(session_id, None)
+        SSE_ACTIVE.discard(session_id)
 
     return response
 
 
+def _enable_tcp_keepalive(transport) -> None:
+    """Have the kernel probe idle SSE connections so dead peers are dropped without app traffic."""
+    sock = transport.get_extra_info("socket")
+    if sock is None:
+        return
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+    # Linux-only knobs: first probe after 30s idle, then every 10s, give up after 3
+    if hasattr(socket, "TCP_KEEPIDLE"):
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, 30)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, 10)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPCNT, 3)
+
+
+def _resume_session(last_event_id: Optional[str]):
+    """Map a Last-Event-ID to (session_id, frames to replay), or (None, []) for a new session."""
+    if not last_event_id:
+        return None, []
+    session_id, _, event_no = last_event_id.rpartition("-")
+    history = SSE_HISTORY.get(session_id)
+    if history is None or not event_no.isdigit():
+        return None, []
+    # The old connection may not have noticed the client left; this one replaces it
+    _close_session(session_id)
+    after = int(event_no)
+    return session_id, [frame for n, frame in history if n > after]
+
+
+def _number_frame(session_id: str, frame: bytes) -> bytes:
+    """Give a session's next event its id and keep it for Last-Event-ID replay.
+
+    Done when the event is queued, not when it is written, so events still
+    queued when a connection drops are replayed on resume.
+    """
+    history = SSE_HISTORY.get(session_id)
+    if history is None:
+        return frame  # ring already evicted: deliverable, but not replayable
+    event_no = history[-1][0] + 1 if history else 1
+    frame = EVENT_ID_TMPL % (session_id.encode("ascii"), event_no) + frame
+    history.append((event_no, frame))
+    return frame
+
+
+def _close_session(session_id: str):
+    """Drop a session's pending frames and tell its writer to finish.
+
+    Dropped events are already in the session's replay history.
+    """
+    queue = SSE_SESSIONS.pop(session_id, None)
+    if queue is not None:
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(None)
+
+
+async def _send_to_session(session_id: str, queue: asyncio.Queue, frame: bytes) -> bool:
+    """Queue a frame for a session; a client that stays full for SSE_PUT_TIMEOUT is disconnected."""
+    frame = _number_frame(session_id, frame)
+    try:
+        await asyncio.wait_for(queue.put(frame), SSE_PUT_TIMEOUT)
+        return True
+    except asyncio.TimeoutError:
+        _close_session(session_id)
+        return False
+
+
+def broadcast(message: dict) -> int:
+    """Send a JSON-RPC message to every SSE session; returns how many accepted it.
+
+    The payload is encoded once (each session only prefixes its event id) and
+    enqueued without waiting, so a slow client can't hold up the rest. A
+    session whose queue is full is closed, the same as in _send_to_session.
+    Nothing sends server-initiated notifications yet; this is the path for them.
+    """
+    frame = EVENT_PREFIX + encode_response(message) + EVENT_SUFFIX
+    sent = 0
+    for session_id, queue in list(SSE_SESSIONS.items()):
+        try:
+            queue.put_nowait(_number_frame(session_id, frame))
+            sent += 1
+        except asyncio.QueueFull:
+            _close_session(session_id)
+    return sent
+
+
+async def keepalive_loop():
+    """Queue a ping on every SSE session idle for the last SSE_PING_INTERVAL seconds.
+
+    A failed ping write ends that session's writer, which is how disconnected
+    clients are noticed.
+    """
+    while True:
+        await asyncio.sleep(SSE_PING_INTERVAL)
+        for session_id, queue in list(SSE_SESSIONS.items()):
+            if session_id not in SSE_ACTIVE and queue.empty():
+                queue.put_nowait(PING_BYTES)
+        SSE_ACTIVE.clear()
+
+
+async def start_keepalive(app=None):
+    """Start the shared keepalive task (registered as an aiohttp startup hook)."""
+    global _KEEPALIVE_TASK
+    if _KEEPALIVE_TASK is None or _KEEPALIVE_TASK.done():
+        _KEEPALIVE_TASK = asyncio.create_task(keepalive_loop())
+
+
+async def stop_keepalive(app=None):
+    """Cancel the keepalive task and close every open session."""
+    global _KEEPALIVE_TASK
+    if _KEEPALIVE_TASK is not None:
+        _KEEPALIVE_TASK.cancel()
+        _KEEPALIVE_TASK = None
+    for session_id in list(SSE_SESSIONS):
+        _close_session(session_id)
+
+
 async def handle_sse_post(request):
     """Handle POST to /sse."""
     if not verify_auth(request):
-        return web.json_response({"error": "Unauthorized"}, status=401)
+        return _unauthorized()
 
     try:
-        data = await request.json()
-        session_id = request.query.get("session_id")
-
-        response_data = await handle_mcp_request(data, session_id)
-
-        if response_data and session_id and session_id in SSE_SESSIONS:
-            sse_response = SSE_SESSIONS.get(session_id)
-            if sse_response:
-                await sse_response.write(f"event: message\ndata: {json.dumps(response_data)}\n\n".encode())
-            return web.Response(status=202)
-        elif response_data:
-            return web.json_response(response_data)
-        else:
-            return web.Response(status=202)
-
-    except Exception as e:
-        return web.json_response(
-            {"jsonrpc": "2.0", "id": None, "error": {"code": -32603, "message": str(e)}},
-            status=500
-        )
+        data = orjson.loads(await request.read())
+    except orjson.JSONDecodeError:
+        return _json({"jsonrpc": "2.0", "id": None, "error": {"code": -32700, "message": "Parse error"}},
+                     status=400)
+    if not isinstance(data, dict):
+        return _json({"jsonrpc": "2.0", "id": None, "error": {"code": -32600, "message": "Invalid Request"}},
+                     status=400)
+
+    session_id = request.query.get("session_id")
+    # Bad tool arguments come back as a JSON-RPC error; any exception here is
+    # a server bug and propagates to aiohttp's error handling
+    response_data = await handle_mcp_request(data, session_id)
+
+    queue = SSE_SESSIONS.get(session_id) if session_id else None
+    if response_data and queue is not None:
+        frame = EVENT_PREFIX + encode_response(response_data) + EVENT_SUFFIX
+        if not await _send_to_session(session_id, queue, frame):
+            return _json({"error": "SSE client not reading; session closed"}, status=503)
+        return web.Response(status=202, headers=CORS_HEADERS)
+    elif response_data:
+        return web.Response(body=encode_response(response_data), content_type="application/json",
+                            headers=CORS_HEADERS)
+    else:
+        return web.Response(status=202, headers=CORS_HEADERS)
 
 
-async def handle_sse(request):
-    """Route /sse based on HTTP method."""
-    if request.method == 'GET':
-        return await handle_sse_get(request)
-    elif request.method == 'POST':
-        return await handle_sse_post(request)
-    return web.Response(status=405)
+# Constant part of the health body, serialized once; handle_health appends
+# the live counters
+_HEALTH_PREFIX = orjson.dumps({
+    "status": "healthy",
+    "service": "report-writer-mcp",
+    "tools": len(TOOLS),
+    "reports_dir": str(REPORTS_DIR),
+})[:-1]
 
 
 async def handle_health(request):
     """Health check endpoint."""
-    return web.json_response({
-        "status": "healthy",
-        "service": "report-writer-mcp",
-        "tools": len(TOOLS),
-        "reports_dir": str(REPORTS_DIR),
-        "active_reports": len(REPORTS),
-        "active_sessions": len(SSE_SESSIONS)
-    })
+    body = _HEALTH_PREFIX + b',"active_reports":%d,"cached_reports":%d,"active_sessions":%d}' % (
+        len(REPORT_JOURNALS), len(REPORTS), len(SSE_SESSIONS))
+    return web.Response(body=body, content_type="application/json", headers=CORS_HEADERS)
 
 
 async def handle_cors_preflight(request):
@@ -821,29 +1514,41 @@ async def handle_cors_preflight(request):
     )
 
 
+async def add_missing_cors_header(request, response):
+    """Add Access-Control-Allow-Origin to responses the handlers didn't build
+    (aiohttp's own 404/405/500 pages), so browser clients can read errors."""
+    if 'Access-Control-Allow-Origin' not in response.headers:
+        response.headers['Access-Control-Allow-Origin'] = '*'
+
+
 def create_app():
     """Create the aiohttp application."""
     app = web.Application()
 
-    @web.middleware
-    async def cors_middleware(request, handler):
-        if request.method == 'OPTIONS':
-            return await handle_cors_preflight(request)
-        response = await handler(request)
-        response.headers['Access-Control-Allow-Origin'] = '*'
-        return response
-
-    app.middlewares.append(cors_middleware)
-
-    app.router.add_get("/sse", handle_sse)
-    app.router.add_post("/sse", handle_sse)
+    app.router.add_get("/sse", handle_sse_get)
+    app.router.add_post("/sse", handle_sse_post)
     app.router.add_options("/sse", handle_cors_preflight)
     app.router.add_get("/health", handle_health)
+    app.router.add_options("/health", handle_cors_preflight)
+    app.on_response_prepare.append(add_missing_cors_header)
+
+    app.on_startup.append(start_keepalive)
+    app.on_shutdown.append(stop_keepalive)
+    app.on_cleanup.append(close_export_pool)
+    app.on_cleanup.append(close_journals)
 
     return app
 
 
 if __name__ == "__main__":
+    # uvloop replaces the default selector loop with libuv; optional so the
+    # server still starts on platforms without it (e.g. Windows dev boxes)
+    try:
+        import uvloop
+        uvloop.install()
+    except ImportError:
+        pass
+
     print("=" * 60)
     print("Report Writer MCP Server (SSE Transport)")
     print("=" * 60)
@@ -857,4 +1562,7 @@ if __name__ == "__main__":
     print("=" * 60)
 
     app = create_app()
-    web.run_app(app, host="0.0.0.0", port=SERVER_PORT)
+    # The larger backlog absorbs bursts of SSE connects. No reuse_port: SSE
+    # sessions and the report cache are per-process, so a second process on
+    # the port must fail to bind rather than silently split the traffic
+    web.run_app(app, host="0.0.0.0", port=SERVER_PORT, backlog=512)